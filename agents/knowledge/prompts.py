@@ -1,53 +1,21 @@
-from agents.knowledge.html_knowledge import get_knowledge_context
-
-
-def build_orchestrator_system_prompt(
-    current_html: str,
-    html_summary: str,
-    component_map: list,
-    edit_history: list,
-    chat_history: list
-) -> str:
-
-    knowledge = get_knowledge_context()
-
-    component_map_str = "None yet."
-    if component_map:
-        lines = []
-        for c in component_map:
-            lines.append(f"  - [{c.get('id','')}] {c.get('selector','')} -- {c.get('description','')}")
-        component_map_str = "\n".join(lines)
+import re
 
-    page_summary_str = html_summary if html_summary else "No summary yet. This appears to be a new or recently imported page."
+from agents.knowledge.html_knowledge import get_knowledge_context
 
-    edit_history_str = "No previous edits."
-    if edit_history:
-        lines = []
-        for e in edit_history:
-            plan = e.get("plan_json", {})
-            desc = plan.get("description", "edit")
-            decision = e.get("decision", "surgical")
-            complexity = e.get("complexity", "simple")
-            success = "succeeded" if e.get("success", True) else "failed"
-            lines.append(f"  - [{complexity}/{decision}] {desc} ({success})")
-        edit_history_str = "\n".join(lines)
 
-    chat_history_str = "No previous messages."
-    if chat_history:
-        lines = []
-        for msg in chat_history:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            msg_type = msg.get("message_type", "chat")
-            if len(content) > 300:
-                content = content[:300] + "..."
-            if msg_type == "clarification":
-                lines.append(f"  ASSISTANT (asked for clarification): {content}")
-            else:
-                lines.append(f"  {role.upper()}: {content}")
-        chat_history_str = "\n".join(lines)
+# ---------------------------------------------------------------------------
+# Static orchestrator prompt prefix
+#
+# Everything that never changes between pages or turns (identity rules,
+# knowledge base, tool docs, decision rules, quality bar) is assembled ONCE
+# at import time and placed FIRST in the system prompt. Volatile context
+# (page summary, histories, current HTML) is appended after it. Keeping the
+# long prefix byte-identical across calls lets the inference providers'
+# prompt caches hit on every turn instead of re-processing ~10-50KB of
+# static text.
+# ---------------------------------------------------------------------------
 
-    return f"""## IDENTITY AND ABSOLUTE OPERATING RULES
+_ORCHESTRATOR_STATIC_PREFIX = f"""## IDENTITY AND ABSOLUTE OPERATING RULES
 
 You are an autonomous HTML/CSS/JS coding agent embedded inside Hyphertext — an AI-powered single-file HTML page builder. Your sole purpose is to CREATE and EDIT HTML pages by calling tools. You are NOT a general assistant, tutor, or chatbot.
 
@@ -63,28 +31,7 @@ You are an autonomous HTML/CSS/JS coding agent embedded inside Hyphertext — an
 ---
 
 ## HTML/CSS/JS KNOWLEDGE BASE
-{knowledge}
-
----
-
-## CURRENT PAGE CONTEXT
-
-### Page Summary
-{page_summary_str}
-
-### Component Map
-{component_map_str}
-
-### Recent Edit History
-{edit_history_str}
-
-### Recent Chat History
-{chat_history_str}
-
----
-
-## CURRENT HTML FILE
-{current_html}
+{get_knowledge_context()}
 
 ---
 
@@ -155,29 +102,129 @@ CSS variables and base styles → component styles → JS logic → content
 - After write_full_file, OR after the last str_replace, you MUST call finish.
 """
 
+_PAGE_CONTEXT_HEADER = "\n---\n\n## CURRENT PAGE CONTEXT\n\n### Page Summary\n"
+_CURRENT_HTML_HEADER = "\n\n---\n\n## CURRENT HTML FILE\n"
+
+
+# Per-item formatters for the volatile context sections. Module-level so
+# they are compiled once and the hot path is a map/join over them instead
+# of re-building closure f-strings per call.
+
+# Pages beyond this size get a bounded context (structural index + head and
+# tail windows) instead of the full file, keeping prompt tokens sub-linear
+# in file size. Generous enough that nearly all real pages fit whole.
+_HTML_CONTEXT_LIMIT = 100_000
+_HTML_WINDOW = 40_000
+
+_STRUCTURE_TAG_RE = re.compile(
+    r"<(?:h[1-6]|section|article|header|footer|nav|main|style|script)\b[^>]*>"
+    r"|<[a-z][a-z0-9]*\b[^>]*\bid=\"[^\"]+\"[^>]*>",
+    re.IGNORECASE,
+)
+
+
+def _bounded_html_context(current_html: str) -> str:
+    if len(current_html) <= _HTML_CONTEXT_LIMIT:
+        return current_html
+
+    index_lines = []
+    for m in _STRUCTURE_TAG_RE.finditer(current_html):
+        tag = m.group(0)
+        if len(tag) > 100:
+            tag = tag[:100] + "..."
+        index_lines.append(f"  @{m.start()}: {tag}")
+        if len(index_lines) >= 200:
+            break
+
+    omitted = len(current_html) - 2 * _HTML_WINDOW
+    return (
+        "NOTE: This file is very large, so only the start and end are shown below, "
+        "plus a structural index of the whole document (character offsets of major elements). "
+        "Only use str_replace with strings visible in the shown regions.\n\n"
+        "### Structural Index\n"
+        + "\n".join(index_lines)
+        + f"\n\n### File Start (first {_HTML_WINDOW} chars)\n"
+        + current_html[:_HTML_WINDOW]
+        + f"\n\n... [{omitted} chars omitted] ...\n\n"
+        + f"### File End (last {_HTML_WINDOW} chars)\n"
+        + current_html[-_HTML_WINDOW:]
+    )
+
+
+def _fmt_component(c: dict) -> str:
+    return f"  - [{c.get('id', '')}] {c.get('selector', '')} -- {c.get('description', '')}"
+
+
+def _fmt_edit(e: dict) -> str:
+    plan = e.get("plan_json", {})
+    return "  - [{}/{}] {} ({})".format(
+        e.get("complexity", "simple"),
+        e.get("decision", "surgical"),
+        plan.get("description", "edit"),
+        "succeeded" if e.get("success", True) else "failed",
+    )
 
-def build_planning_prompt(user_prompt: str, chat_history: list = None) -> str:
-    """
-    Build the planning prompt. Injects recent chat history so the planner
-    understands follow-up messages like "make it darker" or "add a form to it"
-    without treating them as standalone requests.
-    """
-    chat_context = ""
+
+def build_orchestrator_system_prompt(
+    current_html: str,
+    html_summary: str,
+    component_map: list,
+    edit_history: list,
+    chat_history: list
+) -> str:
+
+    component_map_str = "None yet."
+    if component_map:
+        component_map_str = "\n".join(map(_fmt_component, component_map))
+
+    page_summary_str = html_summary if html_summary else "No summary yet. This appears to be a new or recently imported page."
+
+    edit_history_str = "No previous edits."
+    if edit_history:
+        edit_history_str = "\n".join(map(_fmt_edit, edit_history))
+
+    chat_history_str = "No previous messages."
     if chat_history:
         lines = []
-        for msg in chat_history[-6:]:
-            role     = msg.get("role", "")
-            content  = msg.get("content", "")
+        recent_cutoff = len(chat_history) - 4
+        for i, msg in enumerate(chat_history):
+            role = msg.get("role", "")
+            content = msg.get("content", "")
             msg_type = msg.get("message_type", "chat")
-            if msg_type == "thinking":
-                continue
-            if len(content) > 200:
-                content = content[:200] + "..."
-            lines.append(f"  {role.upper()}: {content}")
-        if lines:
-            chat_context = "RECENT CONVERSATION (for context — this is a follow-up to an ongoing session):\n" + "\n".join(lines) + "\n\n"
+            # Older turns only matter as gist — cap them harder than the
+            # last few so long assistant summaries don't bloat the prompt.
+            cap = 300 if i >= recent_cutoff else 120
+            if len(content) > cap:
+                content = content[:cap] + "..."
+            if msg_type == "clarification":
+                lines.append(f"  ASSISTANT (asked for clarification): {content}")
+            else:
+                lines.append(f"  {role.upper()}: {content}")
+        chat_history_str = "\n".join(lines)
 
-    return f"""You are a planning assistant for Hyphertext — an AI-powered single-file HTML page builder.
+    # Single join of precomputed segments — one allocation, no re-parse of
+    # the static prefix through a format string on every call.
+    return "".join((
+        _ORCHESTRATOR_STATIC_PREFIX,
+        _PAGE_CONTEXT_HEADER,
+        page_summary_str,
+        "\n\n### Component Map\n",
+        component_map_str,
+        "\n\n### Recent Edit History\n",
+        edit_history_str,
+        "\n\n### Recent Chat History\n",
+        chat_history_str,
+        _CURRENT_HTML_HEADER,
+        _bounded_html_context(current_html),
+        "\n",
+    ))
+
+
+# The planning prompt's instructions and response schema are constant; only
+# the chat context and user request vary per call. Keep the constant blocks
+# as module strings so each call is a small join, not a re-format of the
+# whole template.
+_PLANNING_PREFIX = """You are a planning assistant for Hyphertext — an AI-powered single-file HTML page builder.
 
 Your job is to analyze the user's request and produce a structured build plan. ALL user requests are treated as requests to create or modify an HTML page. There are no off-topic requests in this system.
 
@@ -190,10 +237,12 @@ Examples of how to interpret requests:
 - "make it darker" (with prior page context) → surgical edit, simple — change color scheme
 - "now add a footer" (with prior page context) → surgical edit, moderate
 
-{chat_context}USER REQUEST: {user_prompt}
+"""
+
+_PLANNING_SUFFIX = """
 
 Respond with a JSON object with these fields:
-{{
+{
   "decision": "full_rewrite" or "surgical_edit",
   "complexity": "simple" or "moderate" or "complex",
   "confidence": 0.0 to 1.0,
@@ -201,21 +250,51 @@ Respond with a JSON object with these fields:
   "clarification_question": "question if needed, else null",
   "description": "one sentence summary of the HTML page or change that will be built",
   "changes": [
-    {{
+    {
       "order": 1,
       "target": "what element or section",
       "what": "what will change",
       "depends_on": []
-    }}
+    }
   ],
   "needs_web_search": true or false,
   "search_query": "query if needed, else null"
-}}
+}
 
 Only respond with the JSON object. No explanation. No markdown fences.
 """
 
 
+def build_planning_prompt(user_prompt: str, chat_history: list = None) -> str:
+    """
+    Build the planning prompt. Injects recent chat history so the planner
+    understands follow-up messages like "make it darker" or "add a form to it"
+    without treating them as standalone requests.
+    """
+    chat_context = ""
+    if chat_history:
+        lines = []
+        for msg in chat_history[-6:]:
+            role     = msg.get("role", "")
+            content  = msg.get("content", "")
+            msg_type = msg.get("message_type", "chat")
+            if msg_type == "thinking":
+                continue
+            if len(content) > 200:
+                content = content[:200] + "..."
+            lines.append(f"  {role.upper()}: {content}")
+        if lines:
+            chat_context = "RECENT CONVERSATION (for context — this is a follow-up to an ongoing session):\n" + "\n".join(lines) + "\n\n"
+
+    return "".join((
+        _PLANNING_PREFIX,
+        chat_context,
+        "USER REQUEST: ",
+        user_prompt,
+        _PLANNING_SUFFIX,
+    ))
+
+
 def build_summary_generation_prompt(current_html: str) -> str:
     return f"""Analyze this HTML page and return a JSON object describing it.
 
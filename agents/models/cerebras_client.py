@@ -7,12 +7,18 @@ Key behaviours:
 2. disable_reasoning passed as extra_body to suppress <think> blocks.
    Some org-tier keys reject it — we catch BadRequestError and retry once without it.
 3. All network calls are non-blocking (await).
+4. Supports streaming (stream=True): tool-call argument deltas are accumulated
+   per index and dispatched early via on_tool_call as soon as their JSON
+   closes, mirroring groq_client. Usage comes from the final chunk via
+   stream_options include_usage.
 """
 
-import json
 import logging
 import traceback
+
+import orjson
 from openai import AsyncOpenAI, BadRequestError
+from agents.models.http_pool import SHARED_ASYNC_CLIENT, consume_stream
 from config import CEREBRAS_API_KEY, CEREBRAS_BASE_URL, CEREBRAS_MODELS
 
 logger = logging.getLogger(__name__)
@@ -20,11 +26,16 @@ logger = logging.getLogger(__name__)
 _client = AsyncOpenAI(
     api_key=CEREBRAS_API_KEY,
     base_url=CEREBRAS_BASE_URL,
+    http_client=SHARED_ASYNC_CLIENT,
 )
 
 
-async def _do_request(model_name: str, kwargs: dict) -> dict:
+async def _do_request(model_name: str, kwargs: dict, on_tool_call=None) -> dict:
     """Execute the API call and normalise response into our standard dict."""
+    if kwargs.get("stream"):
+        response = await _client.chat.completions.create(**kwargs)
+        return await consume_stream(response, on_tool_call=on_tool_call)
+
     response = await _client.chat.completions.create(**kwargs)
     msg = response.choices[0].message
 
@@ -33,14 +44,18 @@ async def _do_request(model_name: str, kwargs: dict) -> dict:
 
     if msg.tool_calls:
         for tc in msg.tool_calls:
+            fn = tc.function
             try:
-                arguments = json.loads(tc.function.arguments)
-            except (json.JSONDecodeError, TypeError):
+                arguments = orjson.loads(fn.arguments)
+            except (orjson.JSONDecodeError, TypeError):
                 arguments = {}
             parsed_tool_calls.append({
                 "id":        tc.id,
-                "name":      tc.function.name,
+                "name":      fn.name,
                 "arguments": arguments,
+                # Raw provider JSON, kept so the orchestrator can echo the
+                # call back into message history without re-serializing.
+                "arguments_json": fn.arguments if isinstance(fn.arguments, str) else "{}",
             })
 
     return {
@@ -58,6 +73,8 @@ async def chat(
     tool_choice=None,
     max_tokens: int = 8000,
     temperature: float = 0.3,
+    stream: bool = False,
+    on_tool_call=None,
 ) -> dict:
     model_name = CEREBRAS_MODELS.get(model_id)
     if not model_name:
@@ -73,6 +90,10 @@ async def chat(
         },
     }
 
+    if stream:
+        kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}
+
     if tools:
         kwargs["tools"] = tools
 
@@ -83,7 +104,7 @@ async def chat(
 
     # Attempt 1: with disable_reasoning
     try:
-        return await _do_request(model_name, kwargs)
+        return await _do_request(model_name, kwargs, on_tool_call=on_tool_call)
 
     except BadRequestError as e:
         err_body = str(e)
@@ -93,7 +114,7 @@ async def chat(
                 err_body[:200],
             )
             kwargs_retry = {k: v for k, v in kwargs.items() if k != "extra_body"}
-            return await _do_request(model_name, kwargs_retry)
+            return await _do_request(model_name, kwargs_retry, on_tool_call=on_tool_call)
         raise
 
     except Exception:
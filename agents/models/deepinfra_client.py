@@ -5,11 +5,13 @@ DeepInfra client — fully async using AsyncOpenAI.
 
 import json
 from openai import AsyncOpenAI
+from agents.models.http_pool import SHARED_ASYNC_CLIENT
 from config import DEEPINFRA_API_KEY, DEEPINFRA_BASE_URL, DEEPINFRA_MODELS
 
 _client = AsyncOpenAI(
     api_key=DEEPINFRA_API_KEY,
     base_url=DEEPINFRA_BASE_URL,
+    http_client=SHARED_ASYNC_CLIENT,
 )
 
 
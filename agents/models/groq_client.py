@@ -1,16 +1,24 @@
 # agents/models/groq_client.py
 """
 Groq client — fully async using AsyncGroq.
+
+Supports streaming (stream=True): tool-call argument deltas are accumulated
+per tool-call index and each call is surfaced via the optional on_tool_call
+callback the moment its JSON arguments close — so the orchestrator can start
+executing a str_replace while the model is still generating the rest of the
+response. The final return shape is identical to the non-streaming path.
 """
 
-import json
 import logging
+
+import orjson
 from groq import AsyncGroq
+from agents.models.http_pool import SHARED_ASYNC_CLIENT, consume_stream
 from config import GROQ_API_KEY, GROQ_MODELS
 
 logger = logging.getLogger(__name__)
 
-_client = AsyncGroq(api_key=GROQ_API_KEY)
+_client = AsyncGroq(api_key=GROQ_API_KEY, http_client=SHARED_ASYNC_CLIENT)
 
 
 async def chat(
@@ -20,6 +28,8 @@ async def chat(
     tool_choice=None,
     max_tokens: int = 8000,
     temperature: float = 0.3,
+    stream: bool = False,
+    on_tool_call=None,
 ) -> dict:
     model_name = GROQ_MODELS.get(model_id)
     if not model_name:
@@ -36,23 +46,33 @@ async def chat(
     if tool_choice:
         kwargs["tool_choice"] = tool_choice
 
+    if stream:
+        kwargs["stream"] = True
+        response = await _client.chat.completions.create(**kwargs)
+        return await consume_stream(response, on_tool_call=on_tool_call)
+
     response = await _client.chat.completions.create(**kwargs)
     msg = response.choices[0].message
 
     tool_calls = None
     if msg.tool_calls:
-        tool_calls = [
-            {
+        tool_calls = [None] * len(msg.tool_calls)
+        for i, tc in enumerate(msg.tool_calls):
+            fn = tc.function
+            tool_calls[i] = {
                 "id": tc.id,
-                "name": tc.function.name,
-                "arguments": json.loads(tc.function.arguments)
+                "name": fn.name,
+                "arguments": orjson.loads(fn.arguments),
+                # Raw provider JSON, kept so the orchestrator can echo the
+                # call back into message history without re-serializing.
+                "arguments_json": fn.arguments,
             }
-            for tc in msg.tool_calls
-        ]
 
     return {
         "content": msg.content or "",
         "tool_calls": tool_calls,
         "input_tokens": response.usage.prompt_tokens if response.usage else 0,
         "output_tokens": response.usage.completion_tokens if response.usage else 0,
-    }
\ No newline at end of file
+    }
+
+
@@ -0,0 +1,141 @@
+# agents/models/http_pool.py
+"""
+Shared plumbing for the model clients: the httpx transport every SDK
+reuses, and the streaming tool-call scanner both chat clients drain
+their streams through.
+
+Without the shared transport, each SDK (groq, openai-compatible,
+anthropic) builds its own httpx.AsyncClient with default pool limits, so
+under bursty load every provider call can pay a fresh TCP+TLS handshake.
+All our clients pass this single pool as http_client= so keep-alive
+connections to each provider host are reused across calls and across
+SDKs.
+"""
+
+import httpx
+import orjson
+
+SHARED_ASYNC_CLIENT = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(120.0, connect=5.0),
+)
+
+
+def _feed_args_fragment(slot: dict, fragment: str) -> None:
+    """
+    Advance the slot's balanced-brace scanner over a new arguments fragment.
+
+    Tracks brace depth / in-string / escape state incrementally, so JSON
+    completion is detected in O(1) per character instead of re-parsing the
+    whole growing buffer on every delta.
+    """
+    depth = slot["depth"]
+    in_string = slot["in_string"]
+    escape = slot["escape"]
+    for ch in fragment:
+        if escape:
+            escape = False
+        elif in_string:
+            if ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{" or ch == "[":
+            depth += 1
+            slot["started"] = True
+        elif ch == "}" or ch == "]":
+            depth -= 1
+    slot["depth"] = depth
+    slot["in_string"] = in_string
+    slot["escape"] = escape
+
+
+def _args_complete(slot: dict) -> bool:
+    return slot["started"] and slot["depth"] == 0 and not slot["in_string"]
+
+
+async def consume_stream(response, on_tool_call=None) -> dict:
+    """
+    Drain a streaming completion into the clients' standard return dict.
+
+    Tool-call argument fragments are buffered per index and fed through a
+    balanced-brace scanner. When on_tool_call is provided, each call is
+    dispatched exactly once, the moment its JSON arguments become complete.
+
+    Usage lives on the final chunk: directly on it for OpenAI-compatible
+    streams with include_usage (Cerebras), under x_groq for Groq.
+    """
+    content_parts: list[str] = []
+    calls: dict[int, dict] = {}
+    dispatched: set[int] = set()
+    input_tokens = 0
+    output_tokens = 0
+
+    async for chunk in response:
+        usage = getattr(chunk, "usage", None)
+        if usage is None:
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) if x_groq else None
+        if usage:
+            input_tokens = usage.prompt_tokens or 0
+            output_tokens = usage.completion_tokens or 0
+
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta is None:
+            continue
+
+        if delta.content:
+            content_parts.append(delta.content)
+
+        for tc in (delta.tool_calls or []):
+            slot = calls.setdefault(tc.index, {
+                "id": None, "name": None, "args": [],
+                "depth": 0, "in_string": False, "escape": False, "started": False,
+            })
+            if tc.id:
+                slot["id"] = tc.id
+            if tc.function:
+                if tc.function.name:
+                    slot["name"] = tc.function.name
+                if tc.function.arguments:
+                    slot["args"].append(tc.function.arguments)
+                    _feed_args_fragment(slot, tc.function.arguments)
+
+            if on_tool_call and tc.index not in dispatched and slot["name"] and _args_complete(slot):
+                try:
+                    arguments = orjson.loads("".join(slot["args"]))
+                except orjson.JSONDecodeError:
+                    continue
+                dispatched.add(tc.index)
+                await on_tool_call({
+                    "id": slot["id"],
+                    "name": slot["name"],
+                    "arguments": arguments,
+                })
+
+    tool_calls = []
+    for index in sorted(calls):
+        slot = calls[index]
+        buffer = "".join(slot["args"])
+        try:
+            arguments = orjson.loads(buffer)
+        except (orjson.JSONDecodeError, TypeError):
+            arguments = {}
+            buffer = "{}"
+        tool_calls.append({
+            "id": slot["id"],
+            "name": slot["name"],
+            "arguments": arguments,
+            "arguments_json": buffer,
+        })
+
+    return {
+        "content": "".join(content_parts),
+        "tool_calls": tool_calls if tool_calls else None,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    }
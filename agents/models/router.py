@@ -15,20 +15,28 @@ async def chat(
     tool_choice=None,
     max_tokens: int = 8000,
     temperature: float = 0.3,
+    stream: bool = False,
+    on_tool_call=None,
 ) -> dict:
     """
     Route a chat request to the appropriate provider.
 
+    stream/on_tool_call are supported by the Groq and Cerebras clients:
+    tool calls are surfaced to on_tool_call as soon as their streamed
+    JSON arguments close, before the full response finishes.
+
     Returns:
         dict: { content, tool_calls, input_tokens, output_tokens }
     """
     if model_id in GROQ_MODELS:
         return await groq_client.chat(
-            model_id, messages, tools, tool_choice, max_tokens, temperature
+            model_id, messages, tools, tool_choice, max_tokens, temperature,
+            stream=stream, on_tool_call=on_tool_call,
         )
     elif model_id in CEREBRAS_MODELS:
         return await cerebras_client.chat(
-            model_id, messages, tools, tool_choice, max_tokens, temperature
+            model_id, messages, tools, tool_choice, max_tokens, temperature,
+            stream=stream, on_tool_call=on_tool_call,
         )
     elif model_id in TOGETHER_MODELS:
         return await together_client.chat(
@@ -5,11 +5,13 @@ Together AI client — fully async using AsyncOpenAI.
 
 import json
 from openai import AsyncOpenAI
+from agents.models.http_pool import SHARED_ASYNC_CLIENT
 from config import TOGETHER_API_KEY, TOGETHER_BASE_URL, TOGETHER_MODELS
 
 _client = AsyncOpenAI(
     api_key=TOGETHER_API_KEY,
     base_url=TOGETHER_BASE_URL,
+    http_client=SHARED_ASYNC_CLIENT,
 )
 
 
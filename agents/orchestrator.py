@@ -14,13 +14,21 @@ Logging: ~10 structured log lines per run, visible in Railway.
 """
 
 import asyncio
-import json
+import hashlib
 import logging
+import re
 import traceback
 
+import orjson
+
 from agents.models import router as model_router
-from agents.tools.html_tools import TOOL_DEFINITIONS, execute_str_replace
-from agents.tools.search_tools import brave_search, format_search_results
+from agents.tools.html_tools import TOOL_DEFINITIONS, execute_str_replace, execute_multi_replace
+from agents.tools.search_tools import (
+    brave_search,
+    format_search_results,
+    match_prefetched_search,
+    prefetch_likely_searches,
+)
 from agents.knowledge.prompts import (
     build_orchestrator_system_prompt,
     build_planning_prompt,
@@ -29,19 +37,22 @@ from agents.knowledge.prompts import (
     build_conversational_reply_prompt,
 )
 from agents.processors.asset_pipeline import process_pending_assets
-from agents.processors.asset_context import build_asset_context
+from agents.processors.asset_context import build_asset_context, invalidate_asset_context
 from database import (
     get_page,
     update_page_html,
+    update_page_html_patch,
     update_page_summary_and_map,
     update_page_coding_model,
     get_chat_history,
+    record_user_message,
     get_edit_history,
     update_message_status,
     insert_assistant_message,
     insert_thinking_message,
     snapshot_version,
     insert_edit_history,
+    defer_write,
     insert_clarification,
     get_pending_clarification,
     resolve_clarification,
@@ -74,6 +85,40 @@ _AGENT_TIMEOUT_SECONDS    = 300
 _MAX_RETRIES_PER_PROVIDER = 2
 _MAX_PLANNING_RETRIES     = 2
 
+# How long the speculative preview waits for further streamed str_replace
+# calls before pushing the shadow document — one coalesced write per burst
+# instead of a full-document round-trip per tool call.
+_SPECULATIVE_PUSH_DEBOUNCE_SECONDS = 0.4
+
+
+# ---------------------------------------------------------------------------
+# Non-blocking agent-status writes
+#
+# set_agent_status is advisory UI state — the agent should never stall a
+# model call or an edit waiting on its round-trip. Writes are launched as
+# background tasks, chained per page so statuses still land in order.
+# ---------------------------------------------------------------------------
+
+_STATUS_TASKS: dict[str, asyncio.Task] = {}
+
+
+def _push_agent_status(page_id: str, status):
+    prev = _STATUS_TASKS.get(page_id)
+
+    async def _write():
+        if prev is not None:
+            try:
+                await prev
+            except Exception:
+                pass
+        await set_agent_status(page_id, status)
+
+    task = asyncio.create_task(_write())
+    _STATUS_TASKS[page_id] = task
+    task.add_done_callback(
+        lambda t: _STATUS_TASKS.pop(page_id, None) if _STATUS_TASKS.get(page_id) is t else None
+    )
+
 
 # ---------------------------------------------------------------------------
 # Provider-bounded model call helpers
@@ -145,6 +190,7 @@ async def _call_coding_model(
     tool_choice,
     max_tokens: int,
     temperature: float,
+    on_tool_call=None,
 ) -> tuple[dict, str]:
     last_exc = None
     call_kwargs = dict(
@@ -153,6 +199,10 @@ async def _call_coding_model(
         tool_choice=tool_choice,
         max_tokens=max_tokens,
         temperature=temperature,
+        # Stream so tool-call deltas arrive incrementally instead of waiting
+        # for the full completion to generate before we can act on it.
+        stream=True,
+        on_tool_call=on_tool_call,
     )
 
     # ── Primary: Cerebras ─────────────────────────────────────────────────────
@@ -224,23 +274,96 @@ class TokenLedger:
 # Internal helpers
 # ---------------------------------------------------------------------------
 
+async def _flush_page_html(page_id: str, current_html: str, patches: list):
+    """
+    Persist pending str_replace edits. When the accumulated patches are small
+    relative to the document, send only the diffs via the patch RPC (one
+    round-trip, fraction of the payload); otherwise — or if the RPC fails —
+    fall back to writing the full HTML.
+    """
+    if patches:
+        patch_bytes = sum(len(p["old_str"]) + len(p["new_str"]) for p in patches)
+        if patch_bytes * 4 < len(current_html):
+            expected = hashlib.md5(current_html.encode()).hexdigest()
+            if await update_page_html_patch(page_id, patches, expected):
+                return
+    await update_page_html(page_id, current_html)
+
+
+async def _consult_prefetched(prefetch_task, query: str):
+    """Serve a web_search from the speculative prefetch if it matches."""
+    if prefetch_task is None:
+        return None
+    try:
+        prefetched = await prefetch_task
+    except Exception:
+        return None
+    return match_prefetched_search(prefetched, query)
+
+
+_BOILERPLATE_STRIPPED = INITIAL_BOILERPLATE.strip()
+# A real page is far larger than the placeholder; anything over this size
+# can't be boilerplate, so skip the O(N) strip/substring scans for it.
+_BOILERPLATE_MAX_LEN = len(INITIAL_BOILERPLATE) + 4096
+
+
 def _is_boilerplate(html: str) -> bool:
     if not html:
         return True
-    if html.strip() == INITIAL_BOILERPLATE.strip():
+    if len(html) > _BOILERPLATE_MAX_LEN:
+        return False
+    if html.strip() == _BOILERPLATE_STRIPPED:
         return True
     if "describe what you want to build" in html:
         return True
     return False
 
 
+# Trivial cosmetic edits ("change the background to blue") always plan the
+# same way, so they don't need a planner round-trip. Matched conservatively:
+# existing page, short imperative prompt, no question — anything else still
+# goes through the planning model.
+_FAST_PLAN_RE = re.compile(
+    r"^(?:please\s+)?(?:change|make|update|set|turn)\b.{0,80}\b"
+    r"(?:colou?r|background|font|text|size|title|heading|padding|margin|spacing)\b",
+    re.IGNORECASE,
+)
+_FAST_PLAN_MAX_LEN = 120
+
+
+def _fast_plan(user_prompt: str, is_new_page: bool) -> dict | None:
+    if is_new_page:
+        return None
+    prompt = user_prompt.strip()
+    if len(prompt) > _FAST_PLAN_MAX_LEN or "?" in prompt:
+        return None
+    if not _FAST_PLAN_RE.match(prompt):
+        return None
+    return {
+        "decision": "surgical_edit",
+        "complexity": "simple",
+        "confidence": 0.9,
+        "needs_clarification": False,
+        "clarification_question": None,
+        "description": prompt,
+        "changes": [],
+        "needs_web_search": False,
+        "search_query": None,
+        "fast_path": True,
+    }
+
+
 def _parse_plan(raw: str) -> dict:
     try:
         cleaned = raw.strip()
         if cleaned.startswith("```"):
-            lines = [l for l in cleaned.split("\n") if not l.startswith("```")]
-            cleaned = "\n".join(lines)
-        return json.loads(cleaned)
+            # Take the outermost JSON object directly — no per-line scan of
+            # the whole blob just to drop the fences.
+            start = cleaned.find("{")
+            end = cleaned.rfind("}")
+            if start >= 0 and end > start:
+                cleaned = cleaned[start:end + 1]
+        return orjson.loads(cleaned)
     except Exception:
         return {
             "decision": "surgical_edit",
@@ -427,7 +550,7 @@ async def _generate_summary_if_needed(
         ledger.add(PLANNING_MODEL, response["input_tokens"], response["output_tokens"])
         raw = response["content"] or ""
         try:
-            parsed        = json.loads(raw.strip().lstrip("```json").rstrip("```").strip())
+            parsed        = orjson.loads(raw.strip().lstrip("```json").rstrip("```").strip())
             summary       = parsed.get("html_summary", raw)
             component_map = parsed.get("component_map", [])
             await update_page_summary_and_map(page_id, summary, component_map)
@@ -463,7 +586,19 @@ async def _run_agent(
         page_id, message_id, len(user_prompt),
     )
 
-    await update_message_status(message_id, "processing")
+    # The "processing" flip rides alongside the context reads below instead of
+    # costing its own up-front round-trip.
+    status_task = asyncio.create_task(update_message_status(message_id, "processing"))
+    record_user_message(page_id, user_prompt)
+
+    # ── load page + history (speculative) ─────────────────────────────────────
+    # Kicked off before the balance check so the reads overlap its round-trip;
+    # they are harmless if the run aborts on insufficient credits.
+    context_task = asyncio.gather(
+        get_page(page_id),
+        get_edit_history(page_id, limit=5),
+        get_chat_history(page_id, limit=10),
+    )
 
     # ── balance check ─────────────────────────────────────────────────────────
     if owner_id:
@@ -471,6 +606,7 @@ async def _run_agent(
         if not balance_check.get("has_balance", True):
             dollar_balance = balance_check.get("dollar_balance", 0.0)
             logger.warning("[agent] Insufficient credits — owner=%s balance=%.4f", owner_id, dollar_balance)
+            await status_task  # keep the processing→error write order
             await update_message_status(message_id, "error")
             await insert_assistant_message(
                 page_id,
@@ -481,19 +617,24 @@ async def _run_agent(
                     "balance": balance_check.get("balance", 0),
                 },
             )
+            context_task.cancel()
             return
 
     # ── load page + history ───────────────────────────────────────────────────
-    page = await get_page(page_id)
+    page, edit_history, chat_history = await context_task
+    await status_task
+    if not page:
+        # Reachable when the caller vouched for owner_id and the existence
+        # check in /agent/run was skipped — a bogus page_id lands here.
+        logger.warning("[agent] Page not found — aborting run page=%s", page_id)
+        await update_message_status(message_id, "error")
+        return
     current_html    = page.get("html_content", "")
     html_summary    = page.get("html_summary", "")
     component_map   = page.get("component_map", [])
     persisted_model = page.get("coding_model_id")
     page_title      = page.get("title", "")
 
-    edit_history = await get_edit_history(page_id, limit=5)
-    chat_history = await get_chat_history(page_id, limit=10)
-
     logger.info(
         "[agent] Page loaded — title=%r is_new=%s has_summary=%s",
         page_title, _is_boilerplate(current_html), bool(html_summary),
@@ -520,19 +661,34 @@ async def _run_agent(
         return
 
     # ── set status: planning ──────────────────────────────────────────────────
-    await set_agent_status(page_id, "planning")
+    _push_agent_status(page_id, "planning")
 
     # ── process pending uploads ───────────────────────────────────────────────
     if owner_id:
         pending_assets = await _get_pending_asset_count(page_id)
         if pending_assets > 0:
             logger.info("[agent] Processing %d pending assets — page=%s", pending_assets, page_id)
-            await set_agent_status(page_id, "processing files")
+            _push_agent_status(page_id, "processing files")
             await process_pending_assets(page_id, owner_id)
-            await set_agent_status(page_id, "planning")
-
-    # ── asset context ─────────────────────────────────────────────────────────
-    asset_context = await build_asset_context(page_id)
+            invalidate_asset_context(page_id)
+            _push_agent_status(page_id, "planning")
+
+    # ── asset context + clarification state ───────────────────────────────────
+    # The page_snapshot row already carries the unresolved clarification
+    # thread; only the remaining independent reads go out concurrently.
+    if "pending_clarification" in page:
+        pending_clarification = page.get("pending_clarification")
+        asset_context, consecutive_clarifications = await asyncio.gather(
+            build_asset_context(page_id),
+            get_consecutive_clarification_count(page_id),
+        )
+    else:
+        # pages-table fallback row (view not deployed yet)
+        asset_context, pending_clarification, consecutive_clarifications = await asyncio.gather(
+            build_asset_context(page_id),
+            get_pending_clarification(page_id),
+            get_consecutive_clarification_count(page_id),
+        )
 
     # ── lazy summary generation ───────────────────────────────────────────────
     is_new_page = _is_boilerplate(current_html)
@@ -544,9 +700,8 @@ async def _run_agent(
         )
 
     # ── resolve pending clarification ─────────────────────────────────────────
-    pending_clarification = await get_pending_clarification(page_id)
     if pending_clarification:
-        await resolve_clarification(pending_clarification["id"], user_prompt)
+        await resolve_clarification(pending_clarification["id"], user_prompt, page_id=page_id)
         user_prompt = (
             f"Earlier you asked: {pending_clarification['question']}\n"
             f"User answered: {user_prompt}\n"
@@ -554,47 +709,55 @@ async def _run_agent(
         )
 
     # ── clarification guard ───────────────────────────────────────────────────
-    consecutive_clarifications = await get_consecutive_clarification_count(page_id)
     clarification_blocked = consecutive_clarifications >= 2
 
+    # ── speculative search prefetch ───────────────────────────────────────────
+    # If the prompt names a well-known frontend library, kick off the likely
+    # CDN search now so it overlaps the planner/coding model's think time.
+    prefetch_task = asyncio.create_task(prefetch_likely_searches(user_prompt))
+
     # ── planning ──────────────────────────────────────────────────────────────
-    logger.info("[agent] Running planner — page=%s", page_id)
-    planning_messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a planning assistant for Hyphertext — an AI-powered HTML page builder. "
-                "ALL user requests are requests to build or modify an HTML page. "
-                "Analyse the user request and return a structured JSON plan."
-            ),
-        },
-        {"role": "user", "content": build_planning_prompt(user_prompt, chat_history=chat_history)},
-    ]
-    try:
-        plan_response = await _call_planning_model(
-            messages=planning_messages,
-            max_tokens=1000,
-            temperature=0.1,
-        )
-        ledger.add(PLANNING_MODEL, plan_response["input_tokens"], plan_response["output_tokens"])
-        plan = _parse_plan(plan_response["content"])
-        logger.info(
-            "[agent] Plan received — decision=%s complexity=%s needs_search=%s — page=%s",
-            plan.get("decision"), plan.get("complexity"), plan.get("needs_web_search"), page_id,
-        )
-    except Exception as exc:
-        logger.warning("[agent] Planning failed — using defaults: %s — page=%s", exc, page_id)
-        plan = {
-            "decision": "full_rewrite" if is_new_page else "surgical_edit",
-            "complexity": "moderate",
-            "confidence": 0.5,
-            "needs_clarification": False,
-            "clarification_question": None,
-            "description": "apply requested changes",
-            "changes": [],
-            "needs_web_search": False,
-            "search_query": None,
-        }
+    plan = _fast_plan(user_prompt, is_new_page)
+    if plan is not None:
+        logger.info("[agent] Fast-path plan — planner call skipped — page=%s", page_id)
+    else:
+        logger.info("[agent] Running planner — page=%s", page_id)
+        planning_messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You are a planning assistant for Hyphertext — an AI-powered HTML page builder. "
+                    "ALL user requests are requests to build or modify an HTML page. "
+                    "Analyse the user request and return a structured JSON plan."
+                ),
+            },
+            {"role": "user", "content": build_planning_prompt(user_prompt, chat_history=chat_history)},
+        ]
+        try:
+            plan_response = await _call_planning_model(
+                messages=planning_messages,
+                max_tokens=1000,
+                temperature=0.1,
+            )
+            ledger.add(PLANNING_MODEL, plan_response["input_tokens"], plan_response["output_tokens"])
+            plan = _parse_plan(plan_response["content"])
+            logger.info(
+                "[agent] Plan received — decision=%s complexity=%s needs_search=%s — page=%s",
+                plan.get("decision"), plan.get("complexity"), plan.get("needs_web_search"), page_id,
+            )
+        except Exception as exc:
+            logger.warning("[agent] Planning failed — using defaults: %s — page=%s", exc, page_id)
+            plan = {
+                "decision": "full_rewrite" if is_new_page else "surgical_edit",
+                "complexity": "moderate",
+                "confidence": 0.5,
+                "needs_clarification": False,
+                "clarification_question": None,
+                "description": "apply requested changes",
+                "changes": [],
+                "needs_web_search": False,
+                "search_query": None,
+            }
 
     if is_new_page:
         plan["decision"] = "full_rewrite"
@@ -616,7 +779,7 @@ async def _run_agent(
         question = plan.get("clarification_question", "Could you clarify what you would like?")
         await insert_clarification(page_id, message_id, question)
         clarification_asked = True
-        await set_agent_status(page_id, None)
+        _push_agent_status(page_id, None)
         await update_message_status(message_id, "completed")
         await insert_assistant_message(
             page_id,
@@ -641,18 +804,20 @@ async def _run_agent(
         await ledger.flush(owner_id, "Planning (clarification)", message_id)
         return
 
-    # ── persist coding model ──────────────────────────────────────────────────
+    # ── persist coding model + thinking message ───────────────────────────────
     coding_model = CODING_MODEL_PRIMARY
+    post_plan_writes = [insert_thinking_message(page_id, {**plan, "_coding_model": coding_model})]
     if not persisted_model:
-        await update_page_coding_model(page_id, coding_model)
-
-    await insert_thinking_message(page_id, {**plan, "_coding_model": coding_model})
+        post_plan_writes.append(update_page_coding_model(page_id, coding_model))
+    await asyncio.gather(*post_plan_writes)
 
     # ── optional web search ───────────────────────────────────────────────────
     if plan.get("needs_web_search") and plan.get("search_query"):
         logger.info("[agent] Web search — query=%r page=%s", plan["search_query"], page_id)
-        await set_agent_status(page_id, "searching")
-        search_results = await brave_search(plan["search_query"])
+        _push_agent_status(page_id, "searching")
+        search_results = await _consult_prefetched(prefetch_task, plan["search_query"])
+        if search_results is None:
+            search_results = await brave_search(plan["search_query"])
         web_searches_used.append(
             {"query": plan["search_query"], "results": search_results}
         )
@@ -665,7 +830,7 @@ async def _run_agent(
 
     # ── determine initial writing status ─────────────────────────────────────
     initial_code_status = "writing" if (is_new_page or plan.get("decision") == "full_rewrite") else "editing"
-    await set_agent_status(page_id, initial_code_status)
+    _push_agent_status(page_id, initial_code_status)
     logger.info(
         "[agent] Starting code generation — status=%s model=%s page=%s",
         initial_code_status, coding_model, page_id,
@@ -709,311 +874,532 @@ async def _run_agent(
     iteration      = 0
     final_summary  = "Done."
 
-    while iteration < max_iterations:
-        iteration += 1
-        logger.info("[agent] Tool loop iteration %d — page=%s", iteration, page_id)
+    # ── speculative str_replace application ───────────────────────────────────
+    # The moment a streamed str_replace's JSON args close (see model clients),
+    # apply it to a shadow copy; a debounced task then pushes the shadow so
+    # the live preview updates while the model is still generating, without
+    # paying a full-document write per streamed call. The canonical apply in
+    # the tool loop below re-runs against current_html; speculation["pushed"]
+    # remembers what actually reached the DB so _reconcile_speculation can
+    # restore the canonical document on EVERY exit path — a wrong draft edit
+    # or a stream that died mid-push never outlives the turn.
+    speculation = {"shadow": current_html, "pushed": None, "push_task": None}
+
+    async def _push_speculative():
+        # Coalesce the burst: every str_replace whose args close inside the
+        # window lands in the shadow before the single push reads it.
+        await asyncio.sleep(_SPECULATIVE_PUSH_DEBOUNCE_SECONDS)
+        # Marked before the await so a push that dies mid-flight is still
+        # treated as possibly landed and gets reconciled.
+        speculation["pushed"] = speculation["shadow"]
+        await update_page_html(page_id, speculation["pushed"])
+
+    def _schedule_speculative_push():
+        task = speculation["push_task"]
+        if task is not None and not task.done():
+            return
+        speculation["push_task"] = asyncio.create_task(_push_speculative())
 
+    async def _settle_speculative_push():
+        """Cancel or drain the pending push so nothing writes behind our back."""
+        task = speculation["push_task"]
+        speculation["push_task"] = None
+        if task is None:
+            return
+        task.cancel()
         try:
-            response, used_model = await _call_coding_model(
-                messages=messages,
-                tools=TOOL_DEFINITIONS,
-                tool_choice="auto",
-                max_tokens=16000,
-                temperature=0.3,
-            )
-        except CodingModelExhaustedError as e:
-            logger.error(
-                "[agent] Coding model chain EXHAUSTED — page=%s message=%s last_err=%s",
-                page_id, message_id, str(e.last_exc)[:200],
-            )
-            await set_agent_status(page_id, None)
-            await update_message_status(message_id, "error")
-            await insert_assistant_message(page_id, e.user_facing_message())
-            await insert_edit_history(
-                page_id=page_id,
-                message_id=message_id,
-                complexity=plan.get("complexity", "unknown"),
-                decision=plan.get("decision", "unknown"),
-                plan_json=plan,
-                changes_json=changes_log,
-                clarification_asked=clarification_asked,
-                web_searches_used=web_searches_used,
-                model_used=coding_model,
-                tokens_used=ledger.total_tokens(),
-                success=False,
-                owner_id=owner_id,
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as exc:
+            logger.warning("[agent] Speculative push failed (ignored) — page=%s: %s", page_id, exc)
+
+    async def _speculate_tool_call(tool_call: dict):
+        if tool_call.get("name") != "str_replace":
+            return
+        args = tool_call.get("arguments") or {}
+        try:
+            updated, ok = execute_str_replace(
+                speculation["shadow"], args.get("old_str", ""), args.get("new_str", "")
             )
-            await ledger.flush(owner_id, "AI edit (model chain exhausted)", message_id)
+            if ok:
+                speculation["shadow"] = updated
+                _schedule_speculative_push()
+        except Exception as exc:
+            logger.warning("[agent] Speculative apply failed (ignored) — page=%s: %s", page_id, exc)
+
+    async def _reconcile_speculation(current: str):
+        """Restore the canonical document wherever optimistic pushes got ahead."""
+        await _settle_speculative_push()
+        if speculation["pushed"] is not None and speculation["pushed"] != current:
+            await update_page_html(page_id, current)
+        speculation["pushed"] = None
+        speculation["shadow"] = current
+
+    async def _commit_pending_html(current: str, patches: list):
+        """Flush turn edits, accounting for what speculation already pushed."""
+        await _settle_speculative_push()
+        if speculation["pushed"] is not None:
+            # DB state is mid-speculation — a patch RPC could double-apply,
+            # so write the full document if anything diverged.
+            if speculation["pushed"] != current:
+                await update_page_html(page_id, current)
+            speculation["pushed"] = None
+            speculation["shadow"] = current
             return
-
-        coding_model = used_model
-        ledger.add(coding_model, response["input_tokens"], response["output_tokens"])
-
-        logger.info(
-            "[agent] Model response received — model=%s has_tool_calls=%s tokens_out=%d — page=%s",
-            coding_model, bool(response["tool_calls"]), response.get("output_tokens", 0), page_id,
+        # Turns that finish inside the debounce window never pushed, so the
+        # cheap patch path still carries them.
+        await _flush_page_html(page_id, current, patches)
+        speculation["shadow"] = current
+
+    # ── draft-model speculation ───────────────────────────────────────────────
+    # For surgical edits, a small fast model proposes candidate str_replace
+    # edits in parallel with the target coding model. Its proposals go through
+    # the same speculative shadow/preview path; the target model's tool calls
+    # remain canonical, and _commit_pending_html writes the full document
+    # whenever the shadow diverged, so a wrong draft costs nothing but the
+    # optimistic preview it briefly showed.
+    async def _draft_speculate() -> dict:
+        resp = await _call_groq(
+            model_id=CONVERSATION_MODEL,
+            messages=messages,
+            tools=TOOL_DEFINITIONS,
+            tool_choice="auto",
+            max_tokens=2000,
+            temperature=0.0,
         )
+        for tc in (resp.get("tool_calls") or []):
+            await _speculate_tool_call(tc)
+        return resp
 
-        # ── model returned text with no tool call ─────────────────────────────
-        if not response["tool_calls"]:
-            content = (response["content"] or "").strip()
-
-            if changes_log:
-                final_summary = content if content else "Edits complete."
-                await snapshot_version(page_id, current_html)
-                await set_agent_status(page_id, None)
-                await update_message_status(message_id, "completed")
-                await insert_assistant_message(page_id, final_summary)
+    try:
+        while iteration < max_iterations:
+            iteration += 1
+            logger.info("[agent] Tool loop iteration %d — page=%s", iteration, page_id)
+
+            # Roll back any speculative preview left over from the previous
+            # iteration (e.g. a draft proposal the target model didn't adopt).
+            await _reconcile_speculation(current_html)
+
+            draft_task = None
+            if iteration == 1 and initial_code_status == "editing":
+                draft_task = asyncio.create_task(_draft_speculate())
+
+            try:
+                response, used_model = await _call_coding_model(
+                    messages=messages,
+                    tools=TOOL_DEFINITIONS,
+                    tool_choice="auto",
+                    max_tokens=16000,
+                    temperature=0.3,
+                    on_tool_call=_speculate_tool_call,
+                )
+            except CodingModelExhaustedError as e:
+                logger.error(
+                    "[agent] Coding model chain EXHAUSTED — page=%s message=%s last_err=%s",
+                    page_id, message_id, str(e.last_exc)[:200],
+                )
+                if draft_task is not None and not draft_task.done():
+                    draft_task.cancel()
+                _push_agent_status(page_id, None)
+                await update_message_status(message_id, "error")
+                await insert_assistant_message(page_id, e.user_facing_message())
                 await insert_edit_history(
                     page_id=page_id,
                     message_id=message_id,
-                    complexity=plan.get("complexity", "simple"),
-                    decision="surgical_edit",
+                    complexity=plan.get("complexity", "unknown"),
+                    decision=plan.get("decision", "unknown"),
                     plan_json=plan,
                     changes_json=changes_log,
                     clarification_asked=clarification_asked,
                     web_searches_used=web_searches_used,
                     model_used=coding_model,
                     tokens_used=ledger.total_tokens(),
-                    success=True,
+                    success=False,
                     owner_id=owner_id,
                 )
-                await ledger.flush(owner_id, f"AI edit: {final_summary[:80]}", message_id)
-                logger.info("[agent] DONE (implicit finish after changes) — page=%s", page_id)
+                await ledger.flush(owner_id, "AI edit (model chain exhausted)", message_id)
                 return
 
-            if iteration < max_iterations:
-                messages.append({"role": "assistant", "content": content})
-                messages.append({
-                    "role": "user",
-                    "content": (
-                        "You MUST call a tool right now. Do not write any prose. "
-                        "This is an HTML page builder — your only job is to call tools.\n"
-                        "- If building or fully rewriting: call write_full_file with the complete HTML document.\n"
-                        "- If making a targeted change: call str_replace with the exact old and new strings.\n"
-                        "- If you need info: call web_search or ask_clarification.\n"
-                        "Call a tool now. The page is waiting."
-                    ),
-                })
-                continue
-            else:
-                final_summary = "I wasn't able to complete that. Please try rephrasing your request."
-                break
-
-        # ── process tool calls ────────────────────────────────────────────────
-        tool_results_for_messages = []
-
-        for tool_call in response["tool_calls"]:
-            fn_name = tool_call["name"]
-            args    = tool_call["arguments"]
-            tc_id   = tool_call["id"]
-
-            logger.info("[agent] Tool call: %s — page=%s", fn_name, page_id)
-
-            # ── write_full_file ───────────────────────────────────────────────
-            if fn_name == "write_full_file":
-                html              = args.get("html", "")
-                summary           = args.get("summary", "Page created.")
-                new_html_summary  = args.get("html_summary", "")
-                new_component_map = args.get("component_map", [])
+            # ── settle the draft speculation task ─────────────────────────────────
+            if draft_task is not None:
+                if draft_task.done() and not draft_task.cancelled():
+                    draft_exc = draft_task.exception()
+                    if draft_exc is None:
+                        draft = draft_task.result()
+                        ledger.add(
+                            CONVERSATION_MODEL,
+                            draft.get("input_tokens", 0),
+                            draft.get("output_tokens", 0),
+                        )
+                        draft_calls = [
+                            (tc["name"], tc["arguments"]) for tc in (draft.get("tool_calls") or [])
+                        ]
+                        target_calls = [
+                            (tc["name"], tc["arguments"]) for tc in (response["tool_calls"] or [])
+                        ]
+                        logger.info(
+                            "[agent] Draft speculation %s — page=%s",
+                            "ACCEPTED" if draft_calls and draft_calls == target_calls[:len(draft_calls)] else "discarded",
+                            page_id,
+                        )
+                else:
+                    draft_task.cancel()
 
-                await set_agent_status(page_id, "writing")
+            coding_model = used_model
+            ledger.add(coding_model, response["input_tokens"], response["output_tokens"])
 
-                if not html:
-                    tool_results_for_messages.append({
-                        "tool_call_id": tc_id,
-                        "result": (
-                            "ERROR: html field is empty. You MUST provide the complete HTML content "
-                            "in the html parameter. The html must be a full valid document starting "
-                            "with <!DOCTYPE html>. Call write_full_file again with the complete HTML now."
-                        ),
-                    })
-                    continue
+            logger.info(
+                "[agent] Model response received — model=%s has_tool_calls=%s tokens_out=%d — page=%s",
+                coding_model, bool(response["tool_calls"]), response.get("output_tokens", 0), page_id,
+            )
 
-                if "<!DOCTYPE" not in html and "<html" not in html:
-                    tool_results_for_messages.append({
-                        "tool_call_id": tc_id,
-                        "result": (
-                            "ERROR: html field does not contain a valid HTML document. "
-                            "It must start with <!DOCTYPE html> and include a full <html> structure. "
-                            "Call write_full_file again with the complete valid HTML document."
+            # ── model returned text with no tool call ─────────────────────────────
+            if not response["tool_calls"]:
+                content = (response["content"] or "").strip()
+
+                if changes_log:
+                    final_summary = content if content else "Edits complete."
+                    _push_agent_status(page_id, None)
+                    # Snapshot and edit-history are audit writes — run them as
+                    # deferred tasks so the turn ends once the user-visible rows
+                    # (message status, assistant reply) have landed.
+                    defer_write(snapshot_version(page_id, current_html))
+                    defer_write(insert_edit_history(
+                        page_id=page_id,
+                        message_id=message_id,
+                        complexity=plan.get("complexity", "simple"),
+                        decision="surgical_edit",
+                        plan_json=plan,
+                        changes_json=changes_log,
+                        clarification_asked=clarification_asked,
+                        web_searches_used=web_searches_used,
+                        model_used=coding_model,
+                        tokens_used=ledger.total_tokens(),
+                        success=True,
+                        owner_id=owner_id,
+                    ))
+                    await asyncio.gather(
+                        update_message_status(message_id, "completed"),
+                        insert_assistant_message(page_id, final_summary),
+                    )
+                    await ledger.flush(owner_id, f"AI edit: {final_summary[:80]}", message_id)
+                    logger.info("[agent] DONE (implicit finish after changes) — page=%s", page_id)
+                    return
+
+                if iteration < max_iterations:
+                    messages.append({"role": "assistant", "content": content})
+                    messages.append({
+                        "role": "user",
+                        "content": (
+                            "You MUST call a tool right now. Do not write any prose. "
+                            "This is an HTML page builder — your only job is to call tools.\n"
+                            "- If building or fully rewriting: call write_full_file with the complete HTML document.\n"
+                            "- If making a targeted change: call str_replace with the exact old and new strings.\n"
+                            "- If you need info: call web_search or ask_clarification.\n"
+                            "Call a tool now. The page is waiting."
                         ),
                     })
                     continue
-
-                await update_page_html(page_id, html)
-                current_html = html
-
-                if new_html_summary:
-                    await update_page_summary_and_map(page_id, new_html_summary, new_component_map)
                 else:
-                    asyncio.create_task(
-                        _generate_and_save_summary(page_id, html, ledger=None)
-                    )
-
-                changes_log.append({"tool": "write_full_file", "summary": summary, "success": True})
-                final_summary = summary
-                await snapshot_version(page_id, html)
-                await set_agent_status(page_id, None)
-                await update_message_status(message_id, "completed")
-                await insert_assistant_message(page_id, summary)
-                await insert_edit_history(
-                    page_id=page_id,
-                    message_id=message_id,
-                    complexity=plan.get("complexity", "moderate"),
-                    decision="full_rewrite",
-                    plan_json=plan,
-                    changes_json=changes_log,
-                    clarification_asked=clarification_asked,
-                    web_searches_used=web_searches_used,
-                    model_used=coding_model,
-                    tokens_used=ledger.total_tokens(),
-                    success=True,
-                    owner_id=owner_id,
+                    final_summary = "I wasn't able to complete that. Please try rephrasing your request."
+                    break
+
+            # ── process tool calls ────────────────────────────────────────────────
+            # str_replace calls are applied to the in-memory HTML as they come,
+            # then flushed to the DB once per assistant turn — N independent
+            # replacements cost one round-trip instead of N.
+            tool_results_for_messages = []
+            html_dirty = False
+            html_patches = []
+
+            # When the model batches several str_replace calls in one turn, apply
+            # them as a single splice over the document instead of rebuilding the
+            # (potentially large) HTML string once per call.
+            multi_results: dict[str, bool] = {}
+            batched = [
+                tc for tc in response["tool_calls"]
+                if tc["name"] == "str_replace" and tc["arguments"].get("old_str")
+            ]
+            if len(batched) >= 2:
+                spliced, results = execute_multi_replace(
+                    current_html,
+                    [(tc["arguments"]["old_str"], tc["arguments"].get("new_str", "")) for tc in batched],
                 )
-                await ledger.flush(owner_id, f"AI page build: {summary[:80]}", message_id)
-                logger.info(
-                    "[agent] DONE write_full_file — summary=%r tokens=%d page=%s",
-                    summary[:60], ledger.total_tokens(), page_id,
+                for tc, ok in zip(batched, results):
+                    multi_results[tc["id"]] = ok
+                if any(results):
+                    current_html = spliced
+
+            # Web searches don't touch current_html, so when a turn contains
+            # several they run concurrently here; the serialized loop below picks
+            # up the results in the model's emission order.
+            parallel_search_results: dict[str, list] = {}
+            search_calls = [tc for tc in response["tool_calls"] if tc["name"] == "web_search"]
+            if len(search_calls) >= 2:
+                async def _run_search(q: str) -> list:
+                    results = await _consult_prefetched(prefetch_task, q)
+                    if results is None:
+                        results = await brave_search(q)
+                    return results
+
+                gathered = await asyncio.gather(
+                    *(_run_search(tc["arguments"].get("query", "")) for tc in search_calls)
                 )
-                return
-
-            # ── str_replace ───────────────────────────────────────────────────
-            elif fn_name == "str_replace":
-                old_str = args.get("old_str", "")
-                new_str = args.get("new_str", "")
-
-                await set_agent_status(page_id, "editing")
-                updated_html, success = execute_str_replace(current_html, old_str, new_str)
-
-                if success:
-                    current_html = updated_html
-                    await update_page_html(page_id, current_html)
-                    changes_log.append({
-                        "tool": "str_replace",
-                        "old_str_preview": old_str[:80],
-                        "success": True,
-                    })
-                    tool_results_for_messages.append({
-                        "tool_call_id": tc_id,
-                        "result": "Replaced successfully. Call finish if all edits are done, or call str_replace again for the next change.",
-                    })
-                    logger.info("[agent] str_replace SUCCESS — page=%s", page_id)
-                else:
-                    changes_log.append({
-                        "tool": "str_replace",
-                        "old_str_preview": old_str[:80],
-                        "success": False,
-                    })
+                for tc, results in zip(search_calls, gathered):
+                    parallel_search_results[tc["id"]] = results
+
+            for tool_call in response["tool_calls"]:
+                fn_name = tool_call["name"]
+                args    = tool_call["arguments"]
+                tc_id   = tool_call["id"]
+
+                logger.info("[agent] Tool call: %s — page=%s", fn_name, page_id)
+
+                # ── write_full_file ───────────────────────────────────────────────
+                if fn_name == "write_full_file":
+                    html              = args.get("html", "")
+                    summary           = args.get("summary", "Page created.")
+                    new_html_summary  = args.get("html_summary", "")
+                    new_component_map = args.get("component_map", [])
+
+                    _push_agent_status(page_id, "writing")
+
+                    if not html:
+                        tool_results_for_messages.append({
+                            "tool_call_id": tc_id,
+                            "result": (
+                                "ERROR: html field is empty. You MUST provide the complete HTML content "
+                                "in the html parameter. The html must be a full valid document starting "
+                                "with <!DOCTYPE html>. Call write_full_file again with the complete HTML now."
+                            ),
+                        })
+                        continue
+
+                    if "<!DOCTYPE" not in html and "<html" not in html:
+                        tool_results_for_messages.append({
+                            "tool_call_id": tc_id,
+                            "result": (
+                                "ERROR: html field does not contain a valid HTML document. "
+                                "It must start with <!DOCTYPE html> and include a full <html> structure. "
+                                "Call write_full_file again with the complete valid HTML document."
+                            ),
+                        })
+                        continue
+
+                    await update_page_html(page_id, html)
+                    current_html = html
+
+                    if new_html_summary:
+                        await update_page_summary_and_map(page_id, new_html_summary, new_component_map)
+                    else:
+                        asyncio.create_task(
+                            _generate_and_save_summary(page_id, html, ledger=None)
+                        )
+
+                    changes_log.append({"tool": "write_full_file", "summary": summary, "success": True})
+                    final_summary = summary
+                    _push_agent_status(page_id, None)
+                    defer_write(snapshot_version(page_id, html))
+                    defer_write(insert_edit_history(
+                        page_id=page_id,
+                        message_id=message_id,
+                        complexity=plan.get("complexity", "moderate"),
+                        decision="full_rewrite",
+                        plan_json=plan,
+                        changes_json=changes_log,
+                        clarification_asked=clarification_asked,
+                        web_searches_used=web_searches_used,
+                        model_used=coding_model,
+                        tokens_used=ledger.total_tokens(),
+                        success=True,
+                        owner_id=owner_id,
+                    ))
+                    # Remaining terminal writes hit independent tables — one
+                    # round-trip of wall time.
+                    await asyncio.gather(
+                        update_message_status(message_id, "completed"),
+                        insert_assistant_message(page_id, summary),
+                    )
+                    await ledger.flush(owner_id, f"AI page build: {summary[:80]}", message_id)
+                    logger.info(
+                        "[agent] DONE write_full_file — summary=%r tokens=%d page=%s",
+                        summary[:60], ledger.total_tokens(), page_id,
+                    )
+                    return
+
+                # ── str_replace ───────────────────────────────────────────────────
+                elif fn_name == "str_replace":
+                    old_str = args.get("old_str", "")
+                    new_str = args.get("new_str", "")
+
+                    _push_agent_status(page_id, "editing")
+                    if tc_id in multi_results:
+                        # Already applied (or rejected) by the batched splice above.
+                        success = multi_results[tc_id]
+                    else:
+                        updated_html, success = execute_str_replace(current_html, old_str, new_str)
+                        if success:
+                            current_html = updated_html
+
+                    if success:
+                        html_dirty = True
+                        html_patches.append({"old_str": old_str, "new_str": new_str})
+                        changes_log.append({
+                            "tool": "str_replace",
+                            "old_str_preview": old_str[:80],
+                            "success": True,
+                        })
+                        tool_results_for_messages.append({
+                            "tool_call_id": tc_id,
+                            "result": "Replaced successfully. Call finish if all edits are done, or call str_replace again for the next change.",
+                        })
+                        logger.info("[agent] str_replace SUCCESS — page=%s", page_id)
+                    else:
+                        changes_log.append({
+                            "tool": "str_replace",
+                            "old_str_preview": old_str[:80],
+                            "success": False,
+                        })
+                        tool_results_for_messages.append({
+                            "tool_call_id": tc_id,
+                            "result": (
+                                "ERROR: old_str not found in the file. "
+                                "The string must match EXACTLY including whitespace and indentation. "
+                                "Try a shorter, more unique substring. "
+                                "Check the current HTML in your context window carefully."
+                            ),
+                        })
+                        logger.warning("[agent] str_replace FAILED — string not found — page=%s", page_id)
+
+                # ── ask_clarification ─────────────────────────────────────────────
+                elif fn_name == "ask_clarification":
+                    question = args.get("question", "Could you clarify?")
+                    if html_dirty:
+                        await _commit_pending_html(current_html, html_patches)
+                        html_dirty = False
+                    await insert_clarification(page_id, message_id, question)
+                    clarification_asked = True
+                    _push_agent_status(page_id, None)
+                    defer_write(insert_edit_history(
+                        page_id=page_id,
+                        message_id=message_id,
+                        complexity=plan.get("complexity", "simple"),
+                        decision="clarification",
+                        plan_json=plan,
+                        changes_json=[],
+                        clarification_asked=True,
+                        web_searches_used=web_searches_used,
+                        model_used=coding_model,
+                        tokens_used=ledger.total_tokens(),
+                        success=True,
+                        owner_id=owner_id,
+                    ))
+                    await asyncio.gather(
+                        update_message_status(message_id, "completed"),
+                        insert_assistant_message(
+                            page_id,
+                            question,
+                            message_type="clarification",
+                            meta={"awaiting_clarification": True},
+                        ),
+                    )
+                    await ledger.flush(owner_id, "Planning (clarification)", message_id)
+                    logger.info("[agent] Clarification asked — page=%s", page_id)
+                    return
+
+                # ── web_search ────────────────────────────────────────────────────
+                elif fn_name == "web_search":
+                    query = args.get("query", "")
+                    logger.info("[agent] In-loop web search — query=%r page=%s", query, page_id)
+                    _push_agent_status(page_id, "searching")
+                    search_results = parallel_search_results.get(tc_id)
+                    if search_results is None:
+                        search_results = await _consult_prefetched(prefetch_task, query)
+                    if search_results is None:
+                        search_results = await brave_search(query)
+                    web_searches_used.append({"query": query, "results": search_results})
+                    formatted = format_search_results(search_results)
                     tool_results_for_messages.append({
                         "tool_call_id": tc_id,
-                        "result": (
-                            "ERROR: old_str not found in the file. "
-                            "The string must match EXACTLY including whitespace and indentation. "
-                            "Try a shorter, more unique substring. "
-                            "Check the current HTML in your context window carefully."
-                        ),
+                        "result": formatted,
                     })
-                    logger.warning("[agent] str_replace FAILED — string not found — page=%s", page_id)
-
-            # ── ask_clarification ─────────────────────────────────────────────
-            elif fn_name == "ask_clarification":
-                question = args.get("question", "Could you clarify?")
-                await insert_clarification(page_id, message_id, question)
-                clarification_asked = True
-                await set_agent_status(page_id, None)
-                await update_message_status(message_id, "completed")
-                await insert_assistant_message(
-                    page_id,
-                    question,
-                    message_type="clarification",
-                    meta={"awaiting_clarification": True},
-                )
-                await insert_edit_history(
-                    page_id=page_id,
-                    message_id=message_id,
-                    complexity=plan.get("complexity", "simple"),
-                    decision="clarification",
-                    plan_json=plan,
-                    changes_json=[],
-                    clarification_asked=True,
-                    web_searches_used=web_searches_used,
-                    model_used=coding_model,
-                    tokens_used=ledger.total_tokens(),
-                    success=True,
-                    owner_id=owner_id,
-                )
-                await ledger.flush(owner_id, "Planning (clarification)", message_id)
-                logger.info("[agent] Clarification asked — page=%s", page_id)
-                return
-
-            # ── web_search ────────────────────────────────────────────────────
-            elif fn_name == "web_search":
-                query = args.get("query", "")
-                logger.info("[agent] In-loop web search — query=%r page=%s", query, page_id)
-                await set_agent_status(page_id, "searching")
-                search_results = await brave_search(query)
-                web_searches_used.append({"query": query, "results": search_results})
-                formatted = format_search_results(search_results)
-                tool_results_for_messages.append({
-                    "tool_call_id": tc_id,
-                    "result": formatted,
+                    # Return to writing/editing status after search
+                    _push_agent_status(page_id, initial_code_status)
+
+                # ── finish ────────────────────────────────────────────────────────
+                elif fn_name == "finish":
+                    final_summary = args.get("summary", "Edits complete.")
+                    if html_dirty:
+                        await _commit_pending_html(current_html, html_patches)
+                        html_dirty = False
+                    _push_agent_status(page_id, None)
+                    defer_write(snapshot_version(page_id, current_html))
+                    defer_write(insert_edit_history(
+                        page_id=page_id,
+                        message_id=message_id,
+                        complexity=plan.get("complexity", "simple"),
+                        decision="surgical_edit",
+                        plan_json=plan,
+                        changes_json=changes_log,
+                        clarification_asked=clarification_asked,
+                        web_searches_used=web_searches_used,
+                        model_used=coding_model,
+                        tokens_used=ledger.total_tokens(),
+                        success=True,
+                        owner_id=owner_id,
+                    ))
+                    await asyncio.gather(
+                        update_message_status(message_id, "completed"),
+                        insert_assistant_message(page_id, final_summary),
+                    )
+                    await ledger.flush(owner_id, f"AI edit: {final_summary[:80]}", message_id)
+                    logger.info(
+                        "[agent] DONE finish — summary=%r tokens=%d page=%s",
+                        final_summary[:60], ledger.total_tokens(), page_id,
+                    )
+                    return
+
+            # ── flush coalesced str_replace edits once per turn ───────────────────
+            if html_dirty:
+                await _commit_pending_html(current_html, html_patches)
+
+            # ── append assistant + tool results to message history ────────────────
+            assistant_msg = {
+                "role": "assistant",
+                "content": response["content"] or "",
+                "tool_calls": [
+                    {
+                        "id": tc["id"],
+                        "type": "function",
+                        "function": {
+                            "name": tc["name"],
+                            # Reuse the provider's own argument bytes when the
+                            # client carried them through; serializing megabyte
+                            # html payloads again per iteration is pure waste.
+                            "arguments": tc.get("arguments_json") or orjson.dumps(tc["arguments"]).decode(),
+                        },
+                    }
+                    for tc in response["tool_calls"]
+                ],
+            }
+            messages.append(assistant_msg)
+
+            for result in tool_results_for_messages:
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": result["tool_call_id"],
+                    "content": result["result"],
                 })
-                # Return to writing/editing status after search
-                await set_agent_status(page_id, initial_code_status)
-
-            # ── finish ────────────────────────────────────────────────────────
-            elif fn_name == "finish":
-                final_summary = args.get("summary", "Edits complete.")
-                await snapshot_version(page_id, current_html)
-                await set_agent_status(page_id, None)
-                await update_message_status(message_id, "completed")
-                await insert_assistant_message(page_id, final_summary)
-                await insert_edit_history(
-                    page_id=page_id,
-                    message_id=message_id,
-                    complexity=plan.get("complexity", "simple"),
-                    decision="surgical_edit",
-                    plan_json=plan,
-                    changes_json=changes_log,
-                    clarification_asked=clarification_asked,
-                    web_searches_used=web_searches_used,
-                    model_used=coding_model,
-                    tokens_used=ledger.total_tokens(),
-                    success=True,
-                    owner_id=owner_id,
-                )
-                await ledger.flush(owner_id, f"AI edit: {final_summary[:80]}", message_id)
-                logger.info(
-                    "[agent] DONE finish — summary=%r tokens=%d page=%s",
-                    final_summary[:60], ledger.total_tokens(), page_id,
-                )
-                return
 
-        # ── append assistant + tool results to message history ────────────────
-        assistant_msg = {
-            "role": "assistant",
-            "content": response["content"] or "",
-            "tool_calls": [
-                {
-                    "id": tc["id"],
-                    "type": "function",
-                    "function": {
-                        "name": tc["name"],
-                        "arguments": json.dumps(tc["arguments"]),
-                    },
-                }
-                for tc in response["tool_calls"]
-            ],
-        }
-        messages.append(assistant_msg)
-
-        for result in tool_results_for_messages:
-            messages.append({
-                "role": "tool",
-                "tool_call_id": result["tool_call_id"],
-                "content": result["result"],
-            })
+    finally:
+        # No matter how the loop ended — terminal return, fall-through, or
+        # an unexpected exception — the stored page must not be left holding
+        # a speculative preview that diverged from the canonical document.
+        try:
+            await _reconcile_speculation(current_html)
+        except Exception as exc:
+            logger.warning("[agent] Speculation rollback failed — page=%s: %s", page_id, exc)
 
     # ── max iterations reached ────────────────────────────────────────────────
     if changes_log:
@@ -1024,11 +1410,9 @@ async def _run_agent(
         len(changes_log), page_id,
     )
 
-    await snapshot_version(page_id, current_html)
-    await set_agent_status(page_id, None)
-    await update_message_status(message_id, "completed")
-    await insert_assistant_message(page_id, final_summary)
-    await insert_edit_history(
+    _push_agent_status(page_id, None)
+    defer_write(snapshot_version(page_id, current_html))
+    defer_write(insert_edit_history(
         page_id=page_id,
         message_id=message_id,
         complexity=plan.get("complexity", "simple"),
@@ -1041,6 +1425,10 @@ async def _run_agent(
         tokens_used=ledger.total_tokens(),
         success=bool(changes_log),
         owner_id=owner_id,
+    ))
+    await asyncio.gather(
+        update_message_status(message_id, "completed"),
+        insert_assistant_message(page_id, final_summary),
     )
     await ledger.flush(owner_id, f"AI edit: {final_summary[:80]}", message_id)
 
@@ -1079,7 +1467,7 @@ async def _generate_and_save_summary(page_id: str, html: str, ledger=None) -> No
         )
         raw = response["content"] or ""
         try:
-            parsed        = json.loads(raw.strip().lstrip("```json").rstrip("```").strip())
+            parsed        = orjson.loads(raw.strip().lstrip("```json").rstrip("```").strip())
             summary       = parsed.get("html_summary", raw)
             component_map = parsed.get("component_map", [])
             await update_page_summary_and_map(page_id, summary, component_map)
@@ -1120,7 +1508,7 @@ async def run_orchestrator(
             page_id, message_id, _AGENT_TIMEOUT_SECONDS,
         )
         try:
-            await set_agent_status(page_id, None)
+            _push_agent_status(page_id, None)
             await update_message_status(message_id, "error")
             await insert_assistant_message(
                 page_id,
@@ -1135,7 +1523,7 @@ async def run_orchestrator(
             page_id, message_id, traceback.format_exc(),
         )
         try:
-            await set_agent_status(page_id, None)
+            _push_agent_status(page_id, None)
             await update_message_status(message_id, "error")
             await insert_assistant_message(
                 page_id,
@@ -2,9 +2,31 @@
 """
 Builds the asset context string injected into the orchestrator system prompt.
 Now async — awaits get_page_assets_ready().
+
+The built string is cached in-process per page: the asset set only changes
+when the upload pipeline runs, so repeat turns on the same page skip
+shipping the wide asset rows and the O(N_assets) formatting. The pipeline
+invalidates the entry via invalidate_asset_context, but gunicorn runs
+several workers, each with its own cache — so, as with the chat-history
+ring buffer in database.py, a cached entry is validated against a cheap
+freshness marker (the exact count of the page's ready assets) before it
+is trusted. A count mismatch means another worker's pipeline run finished
+assets this worker never saw, and the entry is rebuilt. The TTL only
+bounds how long idle entries sit in memory.
 """
 
-from database import get_page_assets_ready
+import io
+import time
+
+from database import get_page_assets_ready, count_page_assets_ready
+
+_CTX_TTL_SECONDS = 300
+_CTX_MAX_PAGES = 512
+_ctx_cache: dict[str, tuple[float, str, int]] = {}
+
+
+def invalidate_asset_context(page_id: str) -> None:
+    _ctx_cache.pop(page_id, None)
 
 
 async def build_asset_context(page_id: str) -> str:
@@ -12,78 +34,95 @@ async def build_asset_context(page_id: str) -> str:
     Returns a formatted string describing all ready assets for the page.
     Returns empty string if no assets exist.
     """
+    hit = _ctx_cache.get(page_id)
+    if hit is not None and time.monotonic() - hit[0] < _CTX_TTL_SECONDS:
+        ready = await count_page_assets_ready(page_id)
+        if ready is not None and ready == hit[2]:
+            return hit[1]
+
     assets = await get_page_assets_ready(page_id)
+    context = _format_asset_context(assets)
+
+    if len(_ctx_cache) >= _CTX_MAX_PAGES:
+        oldest = min(_ctx_cache, key=lambda k: _ctx_cache[k][0])
+        _ctx_cache.pop(oldest, None)
+    _ctx_cache[page_id] = (time.monotonic(), context, len(assets))
+    return context
+
+
+def _format_asset_context(assets: list) -> str:
     if not assets:
         return ""
 
-    sections: list[str] = ["=" * 60, "UPLOADED FILES CONTEXT", "=" * 60]
-
     images    = [a for a in assets if a["asset_type"] == "image"]
     docs      = [a for a in assets if a["asset_type"] == "document"]
     extracted = [a for a in assets if a["asset_type"] == "extracted_image"]
 
+    # Written straight into one buffer — no per-asset intermediate lists and
+    # no second join pass over all the blocks.
+    buf = io.StringIO()
+    buf.write("=" * 60)
+    buf.write("\nUPLOADED FILES CONTEXT\n")
+    buf.write("=" * 60)
+    buf.write("\n")
+
     # ── images ───────────────────────────────────────────────────────────────
     if images:
-        sections.append("\nIMAGES AVAILABLE FOR USE IN HTML")
-        sections.append("You can embed these directly using their URL in <img> tags or CSS background-image.\n")
+        buf.write("\nIMAGES AVAILABLE FOR USE IN HTML\n")
+        buf.write("You can embed these directly using their URL in <img> tags or CSS background-image.\n\n")
         for img in images:
-            block = [f"  File: {img['original_file_name']}"]
+            buf.write(f"  File: {img['original_file_name']}\n")
             if img.get("public_url"):
-                block.append(f"  URL:  {img['public_url']}")
+                buf.write(f"  URL:  {img['public_url']}\n")
             if img.get("vision_description"):
-                block.append(f"  What it shows: {img['vision_description']}")
+                buf.write(f"  What it shows: {img['vision_description']}\n")
             if img.get("vision_suggested_use"):
-                block.append(f"  Suggested use: {img['vision_suggested_use']}")
+                buf.write(f"  Suggested use: {img['vision_suggested_use']}\n")
             if img.get("vision_alt_text"):
-                block.append(f"  Alt text: {img['vision_alt_text']}")
-            if img.get("vision_tags"):
-                tags = img["vision_tags"]
-                if isinstance(tags, list) and tags:
-                    block.append(f"  Tags: {', '.join(str(t) for t in tags)}")
-            if img.get("dominant_colors"):
-                colors = img["dominant_colors"]
-                if isinstance(colors, list) and colors:
-                    block.append(f"  Dominant colors: {', '.join(str(c) for c in colors)}")
+                buf.write(f"  Alt text: {img['vision_alt_text']}\n")
+            tags = img.get("vision_tags")
+            if isinstance(tags, list) and tags:
+                buf.write(f"  Tags: {', '.join(str(t) for t in tags)}\n")
+            colors = img.get("dominant_colors")
+            if isinstance(colors, list) and colors:
+                buf.write(f"  Dominant colors: {', '.join(str(c) for c in colors)}\n")
             if img.get("width") and img.get("height"):
-                block.append(f"  Dimensions: {img['width']}x{img['height']}px")
+                buf.write(f"  Dimensions: {img['width']}x{img['height']}px\n")
             if img.get("vision_contains_text") and img.get("vision_extracted_text"):
-                block.append(f"  Text in image: {img['vision_extracted_text']}")
-            sections.append("\n".join(block))
-            sections.append("")
+                buf.write(f"  Text in image: {img['vision_extracted_text']}\n")
+            buf.write("\n")
 
     # ── documents ────────────────────────────────────────────────────────────
     if docs:
-        sections.append("\nDOCUMENT CONTENT")
-        sections.append("Text extracted from uploaded documents. Use this content when building the page.\n")
+        buf.write("\nDOCUMENT CONTENT\n")
+        buf.write("Text extracted from uploaded documents. Use this content when building the page.\n\n")
         for doc in docs:
-            block = [f"  File: {doc['original_file_name']}"]
+            buf.write(f"  File: {doc['original_file_name']}\n")
             if doc.get("extracted_summary"):
-                block.append(f"  Content:\n{_indent(doc['extracted_summary'], 4)}")
+                buf.write(f"  Content:\n{_indent(doc['extracted_summary'], 4)}\n")
             elif doc.get("extracted_text"):
                 preview = doc["extracted_text"][:600]
                 if len(doc["extracted_text"]) > 600:
                     preview += "\n  [... truncated]"
-                block.append(f"  Content:\n{_indent(preview, 4)}")
-            sections.append("\n".join(block))
-            sections.append("")
+                buf.write(f"  Content:\n{_indent(preview, 4)}\n")
+            buf.write("\n")
 
     # ── extracted images (from PDFs/DOCX) ────────────────────────────────────
     if extracted:
-        sections.append("\nIMAGES EXTRACTED FROM DOCUMENTS")
-        sections.append("These images were found inside uploaded documents.\n")
+        buf.write("\nIMAGES EXTRACTED FROM DOCUMENTS\n")
+        buf.write("These images were found inside uploaded documents.\n\n")
         for img in extracted:
-            block = [f"  File: {img['original_file_name']} (from document)"]
+            buf.write(f"  File: {img['original_file_name']} (from document)\n")
             if img.get("public_url"):
-                block.append(f"  URL:  {img['public_url']}")
+                buf.write(f"  URL:  {img['public_url']}\n")
             if img.get("vision_description"):
-                block.append(f"  What it shows: {img['vision_description']}")
+                buf.write(f"  What it shows: {img['vision_description']}\n")
             if img.get("vision_suggested_use"):
-                block.append(f"  Suggested use: {img['vision_suggested_use']}")
-            sections.append("\n".join(block))
-            sections.append("")
+                buf.write(f"  Suggested use: {img['vision_suggested_use']}\n")
+            buf.write("\n")
 
-    sections.append("=" * 60)
-    return "\n".join(sections)
+    buf.write("=" * 60)
+    return buf.getvalue()
 
 
 def _indent(text: str, spaces: int) -> str:
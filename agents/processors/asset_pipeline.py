@@ -4,7 +4,7 @@ Asset pipeline — fully async.
 Processes all pending assets for a page concurrently using asyncio.gather.
 Each asset runs in its own isolated async task — one failure never blocks others.
 
-Vision token usage is now billed via deduct_dollar_credits after each analyze_image call.
+Vision token usage is billed via deduct_dollar_credits once per vision batch.
 """
 
 import asyncio
@@ -14,15 +14,15 @@ from typing import Optional
 
 from database import (
     get_pending_assets_for_page,
-    update_asset_processing_started,
-    update_asset_image_result,
+    update_assets_processing_started,
+    bulk_update_asset_image_results,
     update_asset_document_result,
-    insert_extracted_image_asset,
+    insert_extracted_image_assets,
     mark_asset_failed,
     get_db,
     deduct_dollar_credits,
 )
-from agents.processors.image_processor import analyze_image
+from agents.processors.image_processor import analyze_images_batch, _fallback_result
 from agents.processors.pdf_processor   import extract_pdf
 from agents.processors.docx_processor  import extract_docx
 from config import VISION_MODEL_ID
@@ -41,34 +41,44 @@ async def process_pending_assets(page_id: str, owner_id: str) -> int:
     if not pending:
         return 0
 
-    tasks = [_process_one(asset, owner_id) for asset in pending]
+    # One status flip covers the whole batch instead of an UPDATE per asset.
+    await update_assets_processing_started([a["id"] for a in pending])
+
+    images = [a for a in pending if a["asset_type"] == "image"]
+    rest   = [a for a in pending if a["asset_type"] != "image"]
+
+    tasks = []
+    if images:
+        tasks.append(_process_images(images, owner_id))
+    tasks.extend(_process_one(asset, owner_id) for asset in rest)
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    success_count = sum(1 for r in results if r is True)
+    success_count = 0
+    for r in results:
+        if r is True:
+            success_count += 1
+        elif isinstance(r, int):
+            success_count += r
     return success_count
 
 
 async def _process_one(asset: dict, owner_id: str) -> bool:
-    """Process a single asset. Returns True on success."""
+    """Process a single non-image asset. Returns True on success."""
     asset_id     = asset["id"]
     asset_type   = asset["asset_type"]
     storage_path = asset.get("storage_path")
 
     try:
-        await update_asset_processing_started(asset_id)
-
         file_bytes = await _download_from_storage(storage_path)
         if file_bytes is None:
             await mark_asset_failed(asset_id, "Could not download file from storage")
             return False
 
-        if asset_type == "image":
-            return await _process_image(asset, file_bytes, owner_id)
-        elif asset_type == "document":
+        if asset_type == "document":
             return await _process_document(asset, file_bytes, owner_id)
-        else:
-            await mark_asset_failed(asset_id, f"Unknown asset_type: {asset_type}")
-            return False
+
+        await mark_asset_failed(asset_id, f"Unknown asset_type: {asset_type}")
+        return False
 
     except Exception as e:
         logger.warning("[ASSET PIPELINE] asset=%s error=%s", asset_id, e)
@@ -76,33 +86,62 @@ async def _process_one(asset: dict, owner_id: str) -> bool:
         return False
 
 
-async def _process_image(asset: dict, file_bytes: bytes, owner_id: str) -> bool:
-    asset_id  = asset["id"]
-    file_type = asset["file_type"]
-    page_id   = asset["page_id"]
+async def _process_images(assets: list, owner_id: str) -> int:
+    """
+    Process all uploaded image assets of the batch as one unit: concurrent
+    downloads, batched vision requests, one billing entry, and a single bulk
+    result UPDATE instead of a round-trip per asset. Returns the success count.
+    """
+    downloads = await asyncio.gather(
+        *[_download_from_storage(a.get("storage_path")) for a in assets],
+        return_exceptions=True,
+    )
+    ready: list = []
+    failed: list = []
+    for asset, file_bytes in zip(assets, downloads):
+        if isinstance(file_bytes, (bytes, bytearray)):
+            ready.append((asset, file_bytes))
+        else:
+            failed.append(asset)
+    if failed:
+        await asyncio.gather(*[
+            mark_asset_failed(a["id"], "Could not download file from storage")
+            for a in failed
+        ])
+    if not ready:
+        return 0
 
-    result = await analyze_image(file_bytes, file_type)
+    try:
+        vision_results = await analyze_images_batch(
+            [(file_bytes, asset["file_type"]) for asset, file_bytes in ready]
+        )
+    except Exception as e:
+        logger.warning("[ASSET PIPELINE] batch vision failed for %d images: %s", len(ready), e)
+        await asyncio.gather(*[mark_asset_failed(a["id"], str(e)) for a, _ in ready])
+        return 0
 
-    # Bill vision tokens if we have an owner
     await _bill_vision_tokens(
         owner_id=owner_id,
-        input_tokens=result.get("input_tokens", 0),
-        output_tokens=result.get("output_tokens", 0),
-        description=f"Vision analysis: {asset.get('original_file_name', 'image')}",
-        reference_id=asset_id,
+        input_tokens=sum(r.get("input_tokens", 0) for r in vision_results),
+        output_tokens=sum(r.get("output_tokens", 0) for r in vision_results),
+        description=f"Vision analysis: {len(ready)} uploaded images",
+        reference_id=ready[0][0]["id"],
     )
 
-    await update_asset_image_result(
-        asset_id=asset_id,
-        vision_description=result["description"],
-        vision_tags=result["detected_objects"],
-        vision_suggested_use=result["suggested_use"],
-        vision_alt_text=result["alt_text"],
-        vision_contains_text=result["contains_text"],
-        vision_extracted_text=result.get("extracted_text", ""),
-        dominant_colors=result["dominant_colors"],
-    )
-    return True
+    await bulk_update_asset_image_results([
+        {
+            "asset_id": asset["id"],
+            "vision_description": result["description"],
+            "vision_tags": result["detected_objects"],
+            "vision_suggested_use": result["suggested_use"],
+            "vision_alt_text": result["alt_text"],
+            "vision_contains_text": result["contains_text"],
+            "vision_extracted_text": result.get("extracted_text", ""),
+            "dominant_colors": result["dominant_colors"],
+        }
+        for (asset, _), result in zip(ready, vision_results)
+    ])
+    return len(ready)
 
 
 async def _process_document(asset: dict, file_bytes: bytes, owner_id: str) -> bool:
@@ -133,19 +172,92 @@ async def _process_document(asset: dict, file_bytes: bytes, owner_id: str) -> bo
     )
 
     if extraction.images:
-        image_tasks = [
-            _process_embedded_image(img, asset, owner_id)
-            for img in extraction.images
-        ]
-        await asyncio.gather(*image_tasks, return_exceptions=True)
+        await _process_embedded_images(extraction.images, asset, owner_id)
 
     return True
 
 
-async def _process_embedded_image(img, parent_asset: dict, owner_id: str) -> None:
-    """Upload an extracted image to storage, run vision, insert as child asset."""
-    page_id   = parent_asset["page_id"]
-    parent_id = parent_asset["id"]
+async def _process_embedded_images(images: list, parent_asset: dict, owner_id: str) -> None:
+    """
+    Upload all extracted images concurrently, analyze them in batched vision
+    requests — one round-trip per batch instead of one per image — then insert
+    the child rows fully formed ("ready", vision fields included) in a single
+    request. Inserting after analysis means the rows never sit in an
+    intermediate status, so no later pipeline run re-downloads bytes that were
+    just uploaded from memory.
+    """
+    uploads = await asyncio.gather(
+        *[_upload_embedded_image(img, parent_asset, owner_id) for img in images],
+        return_exceptions=True,
+    )
+    uploaded = [
+        (meta, img)
+        for meta, img in zip(uploads, images)
+        if isinstance(meta, tuple)
+    ]
+    if not uploaded:
+        return
+
+    try:
+        vision_results = await analyze_images_batch(
+            [(img.bytes, img.mime_type) for _, img in uploaded]
+        )
+    except Exception as e:
+        # The images are already in storage — bailing out here would orphan
+        # the uploads with no rows pointing at them. Insert the children with
+        # placeholder vision fields instead; zero tokens means no billing.
+        logger.warning(
+            "[ASSET PIPELINE] batch vision failed for %d extracted images: %s",
+            len(uploaded), e,
+        )
+        vision_results = [
+            {**_fallback_result(), "input_tokens": 0, "output_tokens": 0}
+            for _ in uploaded
+        ]
+
+    # Batch usage is attached to the first result of each request; one
+    # billing entry covers the whole document's extracted images.
+    await _bill_vision_tokens(
+        owner_id=owner_id,
+        input_tokens=sum(r.get("input_tokens", 0) for r in vision_results),
+        output_tokens=sum(r.get("output_tokens", 0) for r in vision_results),
+        description=(
+            f"Vision analysis: {len(uploaded)} extracted images from "
+            f"{parent_asset.get('original_file_name', 'document')}"
+        ),
+        reference_id=parent_asset["id"],
+    )
+
+    await insert_extracted_image_assets([
+        {
+            "page_id": parent_asset["page_id"],
+            "owner_id": owner_id,
+            "parent_asset_id": parent_asset["id"],
+            "file_name": filename,
+            "original_file_name": filename,
+            "file_type": img.mime_type,
+            "asset_type": "extracted_image",
+            "storage_path": storage_path,
+            "public_url": public_url,
+            "width": img.width,
+            "height": img.height,
+            "file_size_bytes": len(img.bytes),
+            "processing_status": "ready",
+            "vision_description": result["description"],
+            "vision_tags": result["detected_objects"],
+            "vision_suggested_use": result["suggested_use"],
+            "vision_alt_text": result["alt_text"],
+            "vision_contains_text": result["contains_text"],
+            "vision_extracted_text": result.get("extracted_text", ""),
+            "dominant_colors": result["dominant_colors"],
+        }
+        for ((filename, storage_path, public_url), img), result in zip(uploaded, vision_results)
+    ])
+
+
+async def _upload_embedded_image(img, parent_asset: dict, owner_id: str) -> Optional[tuple]:
+    """Upload one extracted image to storage; returns (filename, storage_path, public_url)."""
+    page_id = parent_asset["page_id"]
 
     ext      = img.mime_type.split("/")[-1].replace("jpeg", "jpg")
     filename = f"extracted_{uuid.uuid4().hex[:8]}.{ext}"
@@ -157,50 +269,9 @@ async def _process_embedded_image(img, parent_asset: dict, owner_id: str) -> Non
         content_type=img.mime_type,
     )
     if public_url is None:
-        return
-
-    child_id = await insert_extracted_image_asset(
-        page_id=page_id,
-        owner_id=owner_id,
-        parent_asset_id=parent_id,
-        file_name=filename,
-        original_file_name=filename,
-        file_type=img.mime_type,
-        storage_path=storage_path,
-        public_url=public_url,
-        width=img.width,
-        height=img.height,
-        file_size_bytes=len(img.bytes),
-    )
-
-    if child_id is None:
-        return
-
-    try:
-        vision_result = await analyze_image(img.bytes, img.mime_type)
-
-        # Bill vision tokens for this extracted image too
-        await _bill_vision_tokens(
-            owner_id=owner_id,
-            input_tokens=vision_result.get("input_tokens", 0),
-            output_tokens=vision_result.get("output_tokens", 0),
-            description=f"Vision analysis: extracted image from {parent_asset.get('original_file_name', 'document')}",
-            reference_id=child_id,
-        )
+        return None
 
-        await update_asset_image_result(
-            asset_id=child_id,
-            vision_description=vision_result["description"],
-            vision_tags=vision_result["detected_objects"],
-            vision_suggested_use=vision_result["suggested_use"],
-            vision_alt_text=vision_result["alt_text"],
-            vision_contains_text=vision_result["contains_text"],
-            vision_extracted_text=vision_result.get("extracted_text", ""),
-            dominant_colors=vision_result["dominant_colors"],
-        )
-    except Exception as e:
-        logger.warning("[ASSET PIPELINE] vision failed for extracted image %s: %s", child_id, e)
-        await mark_asset_failed(child_id, "Vision analysis failed for extracted image")
+    return (filename, storage_path, public_url)
 
 
 async def _bill_vision_tokens(
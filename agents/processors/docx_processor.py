@@ -1,19 +1,31 @@
 # agents/processors/docx_processor.py
 """
-Extracts text and embedded images from DOCX files using python-docx.
-Also handles legacy .doc files with a graceful fallback message.
+Extracts text and embedded images from DOCX files by reading the OOXML parts
+directly — one zip open, one lxml parse of word/document.xml, and the image
+rels. Also handles legacy .doc files with a graceful fallback message.
 """
 
 import io
+import posixpath
+import struct
+import zipfile
 from dataclasses import dataclass, field
 from typing import Optional
 
 try:
-    from docx import Document
-    from docx.oxml.ns import qn
-    DOCX_AVAILABLE = True
+    from lxml import etree as LET
+    LXML_AVAILABLE = True
 except ImportError:
-    DOCX_AVAILABLE = False
+    LXML_AVAILABLE = False
+
+try:
+    from PIL import Image as PILImage
+    # Importing the plugins we accept up-front keeps PIL's first open() from
+    # running its full plugin-init cascade inside the extraction loop.
+    from PIL import GifImagePlugin, JpegImagePlugin, PngImagePlugin, WebPImagePlugin  # noqa: F401
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
 
 
 MAX_TEXT_CHARS = 12_000
@@ -22,6 +34,33 @@ MAX_TEXT_CHARS = 12_000
 MIN_IMAGE_WIDTH  = 80
 MIN_IMAGE_HEIGHT = 80
 
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_IMAGE_RELTYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+_P_TAG    = f"{{{_W_NS}}}p"
+_TBL_TAG  = f"{{{_W_NS}}}tbl"
+_BODY_TAG = f"{{{_W_NS}}}body"
+
+# Enough header bytes to size-probe any of the accepted formats (JPEG SOFn
+# markers usually land within the first few KB) without reading whole parts.
+_MEDIA_PEEK_BYTES = 8192
+
+_EXT_TO_MIME = {
+    ".png":  "image/png",
+    ".jpg":  "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif":  "image/gif",
+    ".webp": "image/webp",
+}
+
+if LXML_AVAILABLE:
+    # Compiled once — each call is a straight C-level tree query instead of
+    # python-docx wrapper objects per paragraph/row/cell.
+    _NSMAP     = {"w": _W_NS}
+    _XP_TEXT   = LET.XPath(".//w:t/text()", namespaces=_NSMAP)
+    _XP_STYLE  = LET.XPath("./w:pPr/w:pStyle/@w:val", namespaces=_NSMAP)
+    _XP_ROWS   = LET.XPath("./w:tr", namespaces=_NSMAP)
+    _XP_CELLS  = LET.XPath("./w:tc", namespaces=_NSMAP)
+
 
 @dataclass
 class ExtractedImage:
@@ -55,16 +94,17 @@ def extract_docx(file_bytes: bytes, mime_type: str) -> DOCXExtractionResult:
             error="Legacy .doc format is not supported. Please convert to .docx and re-upload."
         )
 
-    if not DOCX_AVAILABLE:
+    if not LXML_AVAILABLE:
         return DOCXExtractionResult(
             text="",
             summary="",
             was_truncated=False,
-            error="python-docx not installed. Run: pip install python-docx"
+            error="lxml not installed. Run: pip install lxml"
         )
 
     try:
-        doc = Document(io.BytesIO(file_bytes))
+        zf = zipfile.ZipFile(io.BytesIO(file_bytes))
+        xml_stream = zf.open("word/document.xml")
     except Exception as e:
         return DOCXExtractionResult(
             text="",
@@ -77,38 +117,39 @@ def extract_docx(file_bytes: bytes, mime_type: str) -> DOCXExtractionResult:
     total_chars = 0
     was_truncated = False
 
-    # ── text extraction ───────────────────────────────────────────────────────
-    for para in doc.paragraphs:
-        if was_truncated:
-            break
+    def _consume_block(block) -> None:
+        nonlocal total_chars, was_truncated
 
-        text = para.text.strip()
-        if not text:
-            continue
+        if block.tag == _P_TAG:
+            text = "".join(_XP_TEXT(block)).strip()
+            if not text:
+                return
+
+            # Heading style ids are "Heading1", "Heading2", ...
+            styles = _XP_STYLE(block)
+            if styles and styles[0].startswith("Heading"):
+                chunk = f"\n\n## {text}\n"
+            else:
+                chunk = f"\n{text}"
 
-        # Detect headings by style name
-        style_name = para.style.name if para.style else ""
-        if "Heading" in style_name:
-            chunk = f"\n\n## {text}\n"
-        else:
-            chunk = f"\n{text}"
-
-        if total_chars + len(chunk) > MAX_TEXT_CHARS:
-            remaining = MAX_TEXT_CHARS - total_chars
-            if remaining > 50:
-                text_parts.append(chunk[:remaining])
-            text_parts.append("\n\n[... content truncated. Document continues beyond this point.]")
-            was_truncated = True
-            total_chars = MAX_TEXT_CHARS
-        else:
-            text_parts.append(chunk)
-            total_chars += len(chunk)
-
-    # Also extract table text
-    if not was_truncated:
-        for table in doc.tables:
-            for row in table.rows:
-                row_cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+            if total_chars + len(chunk) > MAX_TEXT_CHARS:
+                remaining = MAX_TEXT_CHARS - total_chars
+                if remaining > 50:
+                    text_parts.append(chunk[:remaining])
+                text_parts.append("\n\n[... content truncated. Document continues beyond this point.]")
+                was_truncated = True
+                total_chars = MAX_TEXT_CHARS
+            else:
+                text_parts.append(chunk)
+                total_chars += len(chunk)
+
+        else:  # _TBL_TAG
+            for row in _XP_ROWS(block):
+                row_cells = [
+                    cell_text
+                    for cell in _XP_CELLS(row)
+                    if (cell_text := "".join(_XP_TEXT(cell)).strip())
+                ]
                 if row_cells:
                     chunk = " | ".join(row_cells) + "\n"
                     if total_chars + len(chunk) > MAX_TEXT_CHARS:
@@ -116,59 +157,191 @@ def extract_docx(file_bytes: bytes, mime_type: str) -> DOCXExtractionResult:
                         break
                     text_parts.append(chunk)
                     total_chars += len(chunk)
+
+    # ── text extraction — paragraphs and tables in document order ────────────
+    # Streamed with iterparse so a document far larger than the text budget
+    # stops decompressing and parsing as soon as the budget is spent.
+    try:
+        for _, block in LET.iterparse(xml_stream, events=("end",), tag=(_P_TAG, _TBL_TAG)):
+            parent = block.getparent()
+            if parent is None or parent.tag != _BODY_TAG:
+                continue  # paragraph nested inside a table cell — handled with its table
+
+            _consume_block(block)
+
             if was_truncated:
                 break
 
+            # Free the handled subtree so memory stays flat on huge documents.
+            block.clear()
+            while block.getprevious() is not None:
+                del parent[0]
+    except Exception as e:
+        if not text_parts:
+            return DOCXExtractionResult(
+                text="",
+                summary="",
+                was_truncated=False,
+                error=f"Could not open DOCX: {e}"
+            )
+
     # ── image extraction ──────────────────────────────────────────────────────
+    images = _extract_images(zf)
+
+    full_text = "".join(text_parts).strip()
+    summary   = full_text[:800] if full_text else ""
+
+    return DOCXExtractionResult(
+        text=full_text,
+        summary=summary,
+        was_truncated=was_truncated,
+        images=images,
+    )
+
+
+def _extract_images(zf: zipfile.ZipFile) -> list[ExtractedImage]:
+    """Pull referenced image parts straight from the zip via the document rels."""
     images: list[ExtractedImage] = []
     img_index = 0
 
     try:
-        for rel in doc.part.rels.values():
-            if "image" not in rel.reltype:
+        rels_root = LET.fromstring(zf.read("word/_rels/document.xml.rels"))
+    except Exception:
+        return images  # if image extraction fails entirely, still return text
+
+    seen_parts: set[str] = set()
+    for rel in rels_root:
+        # Exact reltype match — constant-time compare, no substring scan.
+        if rel.get("Type") != _IMAGE_RELTYPE:
+            continue
+        if rel.get("TargetMode") == "External":
+            continue
+        try:
+            target = rel.get("Target") or ""
+            part_name = posixpath.normpath(posixpath.join("word", target))
+            # The same media part is often referenced by several rels
+            # (headers, repeated figures) — size-check and read it once.
+            if part_name in seen_parts:
+                continue
+            seen_parts.add(part_name)
+            content_type = _EXT_TO_MIME.get(posixpath.splitext(part_name)[1].lower())
+            if content_type is None:
                 continue
-            try:
-                img_part = rel.target_part
-                img_bytes = img_part.blob
-                content_type = img_part.content_type  # e.g. "image/jpeg"
 
-                if content_type not in {"image/jpeg", "image/png", "image/gif", "image/webp"}:
+            # Peek just the header first — undersized decorative images are
+            # filtered without decompressing the rest of the part.
+            with zf.open(part_name) as fh:
+                head = fh.read(_MEDIA_PEEK_BYTES)
+                size = _probe_size(head, content_type)
+                if size is not None and (size[0] < MIN_IMAGE_WIDTH or size[1] < MIN_IMAGE_HEIGHT):
                     continue
+                img_bytes = head + fh.read()
 
-                # Attempt to get dimensions via PIL if available
-                width, height = _get_image_dimensions(img_bytes)
+            if size is not None:
+                width, height = size
+            else:
+                width, height = _get_image_dimensions(img_bytes, content_type)
                 if width < MIN_IMAGE_WIDTH or height < MIN_IMAGE_HEIGHT:
                     continue
 
-                images.append(ExtractedImage(
-                    bytes=img_bytes,
-                    mime_type=content_type,
-                    width=width,
-                    height=height,
-                    index=img_index,
-                ))
-                img_index += 1
-            except Exception:
-                continue
-    except Exception:
-        pass  # if image extraction fails entirely, still return text
+            images.append(ExtractedImage(
+                bytes=img_bytes,
+                mime_type=content_type,
+                width=width,
+                height=height,
+                index=img_index,
+            ))
+            img_index += 1
+        except Exception:
+            continue
 
-    full_text = "".join(text_parts).strip()
-    summary   = full_text[:800] if full_text else ""
+    return images
 
-    return DOCXExtractionResult(
-        text=full_text,
-        summary=summary,
-        was_truncated=was_truncated,
-        images=images,
-    )
 
+def _get_image_dimensions(img_bytes: bytes, content_type: str) -> tuple[int, int]:
+    """Returns (width, height). Falls back to (999, 999) if unknowable."""
+    size = _probe_size(img_bytes, content_type)
+    if size is not None:
+        return size
+    if not PIL_AVAILABLE:
+        return (999, 999)  # assume large enough if we can't check
+    try:
+        # open() parses only the header — .size is available without ever
+        # decoding pixel data; the context manager releases the file handle.
+        with PILImage.open(io.BytesIO(img_bytes)) as im:
+            return im.size  # (width, height)
+    except Exception:
+        return (999, 999)
 
-def _get_image_dimensions(img_bytes: bytes) -> tuple[int, int]:
-    """Returns (width, height). Falls back to (999, 999) if PIL unavailable."""
+
+def _probe_size(img_bytes: bytes, content_type: str) -> Optional[tuple[int, int]]:
+    """
+    Read (width, height) straight from the format's magic bytes — a couple of
+    struct.unpacks on the file header instead of a PIL Image per embedded
+    image. Returns None on anything unexpected so the caller can fall back.
+    """
     try:
-        from PIL import Image as PILImage
-        img = PILImage.open(io.BytesIO(img_bytes))
-        return img.size  # (width, height)
+        if content_type == "image/png":
+            if img_bytes[:8] == b"\x89PNG\r\n\x1a\n" and img_bytes[12:16] == b"IHDR":
+                w, h = struct.unpack(">II", img_bytes[16:24])
+                return (w, h)
+        elif content_type == "image/gif":
+            if img_bytes[:6] in (b"GIF87a", b"GIF89a"):
+                w, h = struct.unpack("<HH", img_bytes[6:10])
+                return (w, h)
+        elif content_type == "image/jpeg":
+            return _probe_jpeg_size(img_bytes)
+        elif content_type == "image/webp":
+            return _probe_webp_size(img_bytes)
     except Exception:
-        return (999, 999)  # assume large enough if we can't check
\ No newline at end of file
+        pass
+    return None
+
+
+def _probe_jpeg_size(data: bytes) -> Optional[tuple[int, int]]:
+    """Scan JPEG segments for the first SOFn frame header (skipping DHT/DAC)."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    end = len(data) - 9
+    while 0 <= pos < end:
+        if data[pos] != 0xFF:
+            # Jump to the next marker byte at C speed rather than stepping
+            # through padding one Python iteration per byte.
+            pos = data.find(b"\xff", pos, end)
+            if pos < 0:
+                break
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return (w, h)
+        if marker in (0xD8, 0xD9) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        (seg_len,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        pos += 2 + seg_len
+    return None
+
+
+def _probe_webp_size(data: bytes) -> Optional[tuple[int, int]]:
+    """Decode the RIFF header variants: VP8X (extended), VP8L (lossless), VP8 (lossy)."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        return None
+    fmt = data[12:16]
+    if fmt == b"VP8X":
+        w = int.from_bytes(data[24:27], "little") + 1
+        h = int.from_bytes(data[27:30], "little") + 1
+        return (w, h)
+    if fmt == b"VP8L":
+        bits = int.from_bytes(data[21:25], "little")
+        w = (bits & 0x3FFF) + 1
+        h = ((bits >> 14) & 0x3FFF) + 1
+        return (w, h)
+    if fmt == b"VP8 " and data[23:26] == b"\x9d\x01\x2a":
+        w = int.from_bytes(data[26:28], "little") & 0x3FFF
+        h = int.from_bytes(data[28:30], "little") & 0x3FFF
+        return (w, h)
+    return None
\ No newline at end of file
@@ -4,24 +4,56 @@ Vision analysis using AsyncAnthropic (claude-haiku).
 A process-level semaphore bounds concurrent Anthropic calls to avoid
 rate-limit errors when many users upload images simultaneously.
 
+analyze_images_batch packs several images into one request — a document
+with N embedded figures costs one round-trip and one prompt prefill
+instead of N.
+
 Returns token usage alongside analysis so the asset pipeline can bill correctly.
 """
 
 import asyncio
-import base64
-import json
+import hashlib
 import logging
+import re
+
+import orjson
+
+try:
+    # SIMD-vectorized encoder — multi-MB images encode several times faster.
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
 from anthropic import AsyncAnthropic
-from config import ANTHROPIC_API_KEY
+from agents.models.http_pool import SHARED_ASYNC_CLIENT
+from config import ANTHROPIC_API_KEY, VISION_MAX_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
-_client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+_client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY, http_client=SHARED_ASYNC_CLIENT)
 
 VISION_MODEL = "claude-haiku-4-5-20251001"
 
-# Max concurrent Anthropic vision calls per worker process.
-_VISION_SEMAPHORE = asyncio.Semaphore(50)
+# Max concurrent Anthropic vision calls per worker process. Kept well below
+# the provider rate limit: a single document can extract dozens of embedded
+# images, and an unthrottled fan-out turns into 429s and cascading retries.
+_VISION_SEMAPHORE = asyncio.Semaphore(VISION_MAX_CONCURRENCY)
+
+_SUPPORTED_MIME = {"image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"}
+
+# Images per batched vision request — bounded by request-size limits.
+_VISION_BATCH_SIZE = 8
+
+# Content-hash cache of successful analyses: the same logo uploaded twice, or
+# a watermark repeated on every page of a PDF, costs one vision call instead
+# of one per occurrence. FIFO-bounded; fallback results are never cached.
+_VISION_CACHE_MAX = 256
+_vision_cache: dict[str, dict] = {}
+
+
+def _vision_cache_put(digest: str, result: dict) -> None:
+    if len(_vision_cache) >= _VISION_CACHE_MAX:
+        _vision_cache.pop(next(iter(_vision_cache)))
+    _vision_cache[digest] = result
 
 VISION_PROMPT = """Analyze this image carefully and return a JSON object with the following fields.
 Be concise but precise — this description will be given to an AI coding agent that will use the image in an HTML page.
@@ -39,6 +71,23 @@ Be concise but precise — this description will be given to an AI coding agent
 
 Return only the JSON object. No markdown fences. No explanation."""
 
+VISION_BATCH_PROMPT = """You were shown {count} images, labeled Image 1 through Image {count}.
+For EACH image, in order, produce a JSON object with exactly the fields described below.
+Be concise but precise — these descriptions will be given to an AI coding agent that will use the images in an HTML page.
+
+{{
+  "description": "2-3 sentence description of what this image shows.",
+  "detected_objects": ["list", "of", "main", "objects", "or", "subjects"],
+  "contains_people": true or false,
+  "contains_text": true or false,
+  "extracted_text": "any text visible in the image, verbatim. empty string if none.",
+  "dominant_colors": ["#hexcolor1", "#hexcolor2", "#hexcolor3"],
+  "suggested_use": one of: "profile_photo" | "product_image" | "logo" | "background" | "diagram" | "illustration" | "document_scan" | "other",
+  "alt_text": "concise accessible alt text for the image"
+}}
+
+Return only a JSON array of {count} objects, in image order. No markdown fences. No explanation."""
+
 
 async def analyze_image(image_bytes: bytes, mime_type: str) -> dict:
     """
@@ -50,11 +99,15 @@ async def analyze_image(image_bytes: bytes, mime_type: str) -> dict:
       - output_tokens (int)
     so the caller can bill accurately.
     """
-    supported = {"image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"}
-    if mime_type not in supported:
+    if mime_type not in _SUPPORTED_MIME:
         return {**_svg_placeholder(), "input_tokens": 0, "output_tokens": 0}
 
-    b64 = base64.standard_b64encode(image_bytes).decode("utf-8")
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    cached = _vision_cache.get(digest)
+    if cached is not None:
+        return {**cached, "input_tokens": 0, "output_tokens": 0}
+
+    b64 = _b64.b64encode(image_bytes).decode("ascii")
 
     async with _VISION_SEMAPHORE:
         response = await _client.messages.create(
@@ -84,29 +137,125 @@ async def analyze_image(image_bytes: bytes, mime_type: str) -> dict:
     input_tokens  = response.usage.input_tokens  if response.usage else 0
     output_tokens = response.usage.output_tokens if response.usage else 0
 
-    raw = response.content[0].text.strip()
+    raw = _strip_fences(response.content[0].text)
 
-    if raw.startswith("```"):
-        lines = raw.split("\n")
-        lines = [l for l in lines if not l.startswith("```")]
-        raw = "\n".join(lines).strip()
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return {**_fallback_result(), "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+    result = _normalize_result(data)
+    _vision_cache_put(digest, result)
+    return {**result, "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+async def analyze_images_batch(items: list[tuple[bytes, str]]) -> list[dict]:
+    """
+    Analyze several images, packing up to _VISION_BATCH_SIZE per request.
+    Returns one dict per item in order, same shape as analyze_image.
+    Request token usage is attached to the first result of each batch so
+    summing over results bills correctly.
+    """
+    results: list[dict] = [None] * len(items)
+    batchable: list[int] = []
+    seen_digests: dict[str, int] = {}
+    duplicates: list[tuple[int, int]] = []
+
+    for i, (image_bytes, mime_type) in enumerate(items):
+        if mime_type not in _SUPPORTED_MIME:
+            results[i] = {**_svg_placeholder(), "input_tokens": 0, "output_tokens": 0}
+            continue
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        cached = _vision_cache.get(digest)
+        if cached is not None:
+            results[i] = {**cached, "input_tokens": 0, "output_tokens": 0}
+        elif digest in seen_digests:
+            duplicates.append((i, seen_digests[digest]))
+        else:
+            seen_digests[digest] = i
+            batchable.append(i)
+
+    for start in range(0, len(batchable), _VISION_BATCH_SIZE):
+        indices = batchable[start:start + _VISION_BATCH_SIZE]
+        if len(indices) == 1:
+            i = indices[0]
+            results[i] = await analyze_image(items[i][0], items[i][1])
+            continue
+        for i, result in zip(indices, await _analyze_batch([items[i] for i in indices])):
+            results[i] = result
+
+    # Repeated images within the same call share their original's analysis.
+    for i, original in duplicates:
+        results[i] = {**results[original], "input_tokens": 0, "output_tokens": 0}
 
+    return results
+
+
+async def _analyze_batch(items: list[tuple[bytes, str]]) -> list[dict]:
+    """One vision request covering all given (already-supported) images."""
+    content = []
+    for n, (image_bytes, mime_type) in enumerate(items, 1):
+        content.append({"type": "text", "text": f"Image {n}:"})
+        content.append({
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": mime_type,
+                "data": _b64.b64encode(image_bytes).decode("ascii"),
+            },
+        })
+    content.append({
+        "type": "text",
+        "text": VISION_BATCH_PROMPT.format(count=len(items)),
+    })
+
+    async with _VISION_SEMAPHORE:
+        response = await _client.messages.create(
+            model=VISION_MODEL,
+            max_tokens=min(1024 * len(items), 8192),
+            messages=[{"role": "user", "content": content}],
+        )
+
+    input_tokens  = response.usage.input_tokens  if response.usage else 0
+    output_tokens = response.usage.output_tokens if response.usage else 0
+
+    raw = _strip_fences(response.content[0].text)
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError:
-        return {
-            "description":      "Image uploaded by user.",
-            "detected_objects": [],
-            "contains_people":  False,
-            "contains_text":    False,
-            "extracted_text":   "",
-            "dominant_colors":  [],
-            "suggested_use":    "other",
-            "alt_text":         "Uploaded image",
-            "input_tokens":     input_tokens,
-            "output_tokens":    output_tokens,
-        }
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        data = None
+
+    if not isinstance(data, list) or len(data) != len(items):
+        logger.warning(
+            "[image_processor] Batch vision response malformed (%d items expected)",
+            len(items),
+        )
+        results = [_fallback_result() for _ in items]
+    else:
+        results = [_normalize_result(d if isinstance(d, dict) else {}) for d in data]
+        for (image_bytes, _), result in zip(items, results):
+            _vision_cache_put(hashlib.sha256(image_bytes).hexdigest(), result)
+
+    for i, result in enumerate(results):
+        result["input_tokens"]  = input_tokens  if i == 0 else 0
+        result["output_tokens"] = output_tokens if i == 0 else 0
+    return results
+
 
+# Leading/trailing markdown fences around the model's JSON.
+_FENCE_RE = re.compile(r"^```[a-z]*\s*\n?|\n?```\s*$")
+
+
+def _strip_fences(raw: str) -> str:
+    raw = raw.strip()
+    if raw.startswith("```"):
+        # One C-level regex sweep instead of splitting, filtering, and
+        # re-joining every line of the response.
+        raw = _FENCE_RE.sub("", raw).strip()
+    return raw
+
+
+def _normalize_result(data: dict) -> dict:
     return {
         "description":      str(data.get("description", "")),
         "detected_objects": list(data.get("detected_objects", [])),
@@ -116,8 +265,19 @@ async def analyze_image(image_bytes: bytes, mime_type: str) -> dict:
         "dominant_colors":  list(data.get("dominant_colors", [])),
         "suggested_use":    str(data.get("suggested_use", "other")),
         "alt_text":         str(data.get("alt_text", "Uploaded image")),
-        "input_tokens":     input_tokens,
-        "output_tokens":    output_tokens,
+    }
+
+
+def _fallback_result() -> dict:
+    return {
+        "description":      "Image uploaded by user.",
+        "detected_objects": [],
+        "contains_people":  False,
+        "contains_text":    False,
+        "extracted_text":   "",
+        "dominant_colors":  [],
+        "suggested_use":    "other",
+        "alt_text":         "Uploaded image",
     }
 
 
@@ -5,6 +5,8 @@ Returns extracted text (markdown-formatted) and a list of image blobs.
 """
 
 import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -22,6 +24,11 @@ MAX_TEXT_CHARS = 12_000
 MIN_IMAGE_WIDTH  = 80
 MIN_IMAGE_HEIGHT = 80
 
+# MuPDF's text/image decode releases the GIL, so pages extract well in
+# parallel. Documents are NOT safe to share across threads, so each worker
+# thread opens its own handle on the same bytes.
+MAX_EXTRACT_WORKERS = 8
+
 
 @dataclass
 class ExtractedImage:
@@ -74,17 +81,13 @@ def extract_pdf(file_bytes: bytes) -> PDFExtractionResult:
     total_chars = 0
     was_truncated = False
 
-    for page_num in range(page_count):
-        if was_truncated:
-            break
-
-        page = doc[page_num]
+    workers = min(MAX_EXTRACT_WORKERS, page_count)
 
-        # ── text extraction ──────────────────────────────────────────────────
-        page_text = page.get_text("text").strip()
+    def _accumulate(page_num: int, page_text: str, page_images: list) -> None:
+        """Sequential budget accounting — truncation semantics stay serial."""
+        nonlocal total_chars, was_truncated
         if page_text:
-            header = f"\n\n--- Page {page_num + 1} ---\n"
-            chunk = header + page_text
+            chunk = f"\n\n--- Page {page_num + 1} ---\n" + page_text
             if total_chars + len(chunk) > MAX_TEXT_CHARS:
                 remaining = MAX_TEXT_CHARS - total_chars
                 if remaining > 100:
@@ -92,40 +95,44 @@ def extract_pdf(file_bytes: bytes) -> PDFExtractionResult:
                 text_parts.append(f"\n\n[... content truncated at {MAX_TEXT_CHARS} characters. Document has {page_count} pages total.]")
                 was_truncated = True
                 total_chars = MAX_TEXT_CHARS
-            else:
-                text_parts.append(chunk)
-                total_chars += len(chunk)
-
-        # ── image extraction ─────────────────────────────────────────────────
-        image_list = page.get_images(full=True)
-        for img_index, img_info in enumerate(image_list):
-            xref = img_info[0]
+                return
+            text_parts.append(chunk)
+            total_chars += len(chunk)
+        images.extend(page_images)
+
+    if workers <= 1:
+        for page_num in range(page_count):
+            _accumulate(page_num, *_extract_page(doc, page_num))
+            if was_truncated:
+                break
+        doc.close()
+    else:
+        doc.close()
+        tls = threading.local()
+        thread_docs: list = []
+
+        def _page(page_num: int):
+            tdoc = getattr(tls, "doc", None)
+            if tdoc is None:
+                tdoc = tls.doc = fitz.open(stream=file_bytes, filetype="pdf")
+                thread_docs.append(tdoc)
+            return _extract_page(tdoc, page_num)
+
+        # Pages are dispatched one wave at a time so a truncating document
+        # wastes at most one wave of decode work past the budget.
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for wave_start in range(0, page_count, workers):
+                wave = range(wave_start, min(wave_start + workers, page_count))
+                for page_num, (page_text, page_images) in zip(wave, executor.map(_page, wave)):
+                    if not was_truncated:
+                        _accumulate(page_num, page_text, page_images)
+                if was_truncated:
+                    break
+        for tdoc in thread_docs:
             try:
-                base_image = doc.extract_image(xref)
-                img_bytes  = base_image["image"]
-                img_ext    = base_image["ext"]          # e.g. "jpeg", "png"
-                img_w      = base_image.get("width", 0)
-                img_h      = base_image.get("height", 0)
-
-                if img_w < MIN_IMAGE_WIDTH or img_h < MIN_IMAGE_HEIGHT:
-                    continue  # skip tiny decorative elements
-
-                mime = _ext_to_mime(img_ext)
-                if mime is None:
-                    continue  # skip unsupported formats
-
-                images.append(ExtractedImage(
-                    bytes=img_bytes,
-                    mime_type=mime,
-                    page_number=page_num + 1,
-                    width=img_w,
-                    height=img_h,
-                    index_on_page=img_index,
-                ))
+                tdoc.close()
             except Exception:
-                continue  # skip problematic images silently
-
-    doc.close()
+                pass
 
     full_text = "".join(text_parts).strip()
     summary   = full_text[:800] if full_text else ""
@@ -139,6 +146,42 @@ def extract_pdf(file_bytes: bytes) -> PDFExtractionResult:
     )
 
 
+def _extract_page(doc, page_num: int) -> tuple[str, list[ExtractedImage]]:
+    """Extract one page's text and qualifying images from the given document handle."""
+    page = doc[page_num]
+    page_text = page.get_text("text").strip()
+
+    page_images: list[ExtractedImage] = []
+    for img_index, img_info in enumerate(page.get_images(full=True)):
+        xref = img_info[0]
+        try:
+            base_image = doc.extract_image(xref)
+            img_bytes  = base_image["image"]
+            img_ext    = base_image["ext"]          # e.g. "jpeg", "png"
+            img_w      = base_image.get("width", 0)
+            img_h      = base_image.get("height", 0)
+
+            if img_w < MIN_IMAGE_WIDTH or img_h < MIN_IMAGE_HEIGHT:
+                continue  # skip tiny decorative elements
+
+            mime = _ext_to_mime(img_ext)
+            if mime is None:
+                continue  # skip unsupported formats
+
+            page_images.append(ExtractedImage(
+                bytes=img_bytes,
+                mime_type=mime,
+                page_number=page_num + 1,
+                width=img_w,
+                height=img_h,
+                index_on_page=img_index,
+            ))
+        except Exception:
+            continue  # skip problematic images silently
+
+    return page_text, page_images
+
+
 def _ext_to_mime(ext: str) -> Optional[str]:
     mapping = {
         "jpeg": "image/jpeg",
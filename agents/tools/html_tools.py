@@ -143,8 +143,51 @@ TOOL_DEFINITIONS = [
 ]
 
 
+def execute_multi_replace(current_html: str, replacements: list) -> tuple[str, list]:
+    """
+    Apply many str_replace edits in one output splice.
+
+    replacements: list of (old_str, new_str) pairs. Each old_str is located
+    in the ORIGINAL document (first occurrence); matches are applied left to
+    right and any match overlapping an already-consumed region is skipped and
+    reported as failed — independent edits on disjoint substrings commute, so
+    this is equivalent to applying them one at a time, without rebuilding the
+    document k times.
+
+    Returns (new_html, results) where results[i] is True if replacement i
+    was applied.
+    """
+    results = [False] * len(replacements)
+    matches = []  # (start, end, index, new_str)
+    for i, (old_str, new_str) in enumerate(replacements):
+        if not old_str:
+            continue
+        idx = current_html.find(old_str)
+        if idx >= 0:
+            matches.append((idx, idx + len(old_str), i, new_str))
+    matches.sort()
+
+    parts = []
+    cursor = 0
+    for start, end, i, new_str in matches:
+        if start < cursor:
+            continue  # overlaps an earlier replacement — conflict, skip
+        parts.append(current_html[cursor:start])
+        parts.append(new_str)
+        results[i] = True
+        cursor = end
+    parts.append(current_html[cursor:])
+    return "".join(parts), results
+
+
 def execute_str_replace(current_html: str, old_str: str, new_str: str) -> tuple[str, bool]:
-    if old_str not in current_html:
+    # Cheap rejects before touching the document: an empty pattern would
+    # "match" at position 0, and one longer than the file can never match.
+    if not old_str or len(old_str) > len(current_html):
+        return current_html, False
+    # Single find + slice splice: one O(N) scan instead of the two that
+    # `in` followed by `.replace()` would cost on a large document.
+    idx = current_html.find(old_str)
+    if idx < 0:
         return current_html, False
-    updated = current_html.replace(old_str, new_str, 1)
-    return updated, True
\ No newline at end of file
+    return current_html[:idx] + new_str + current_html[idx + len(old_str):], True
\ No newline at end of file
@@ -1,11 +1,50 @@
-import httpx
+import asyncio
+import re
+import time
+
+from agents.models.http_pool import SHARED_ASYNC_CLIENT
 from config import BRAVE_SEARCH_API_KEY, BRAVE_SEARCH_URL
 
+# Identical queries recur across users and across turns; an hour-fresh
+# in-process cache saves the Brave round-trip and rate-limit budget.
+_SEARCH_CACHE_TTL_SECONDS = 3600
+_SEARCH_CACHE_MAX = 256
+_search_cache: dict[str, tuple[float, list]] = {}
+
+# A 429/503 from Brave would otherwise abort the whole agent turn and force
+# the model to re-plan; a couple of short, Retry-After-aware retries are far
+# cheaper than that.
+_SEARCH_MAX_ATTEMPTS = 3
+_SEARCH_MAX_BACKOFF_SECONDS = 10.0
+
+
+def _retry_delay(response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), _SEARCH_MAX_BACKOFF_SECONDS)
+        except ValueError:
+            pass
+    return min(0.5 * (2 ** (attempt - 1)), _SEARCH_MAX_BACKOFF_SECONDS)
+
+# Library names whose mention in a user prompt usually ends in a web_search
+# for a CDN link. Used to speculate searches during the model's think time.
+_LIBRARY_HINT_RE = re.compile(
+    r"\b(chart\.?js|three\.?js|d3\.?js|leaflet|mapbox|tailwind(?:css)?|bootstrap"
+    r"|font ?awesome|gsap|anime\.?js|swiper|alpine\.?js|htmx)\b",
+    re.IGNORECASE,
+)
+
 
 async def brave_search(query: str, count: int = 5) -> list[dict]:
     if not BRAVE_SEARCH_API_KEY:
         return [{"title": "Search unavailable", "description": "No Brave Search API key configured.", "url": ""}]
 
+    cache_key = f"{' '.join(query.lower().split())}:{count}"
+    hit = _search_cache.get(cache_key)
+    if hit is not None and time.monotonic() - hit[0] < _SEARCH_CACHE_TTL_SECONDS:
+        return hit[1]
+
     headers = {
         "Accept": "application/json",
         "Accept-Encoding": "gzip",
@@ -18,10 +57,18 @@ async def brave_search(query: str, count: int = 5) -> list[dict]:
         "search_lang": "en"
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(BRAVE_SEARCH_URL, headers=headers, params=params)
+    # The shared pooled client keeps the Brave connection warm — no TCP/TLS
+    # handshake per search; concurrent searches reuse kept-alive connections.
+    for attempt in range(1, _SEARCH_MAX_ATTEMPTS + 1):
+        response = await SHARED_ASYNC_CLIENT.get(
+            BRAVE_SEARCH_URL, headers=headers, params=params, timeout=10.0
+        )
+        if response.status_code in (429, 503) and attempt < _SEARCH_MAX_ATTEMPTS:
+            await asyncio.sleep(_retry_delay(response, attempt))
+            continue
         response.raise_for_status()
         data = response.json()
+        break
 
     results = []
     web_results = data.get("web", {}).get("results", [])
@@ -31,9 +78,47 @@ async def brave_search(query: str, count: int = 5) -> list[dict]:
             "description": r.get("description", ""),
             "url": r.get("url", "")
         })
+
+    if len(_search_cache) >= _SEARCH_CACHE_MAX:
+        oldest = min(_search_cache, key=lambda k: _search_cache[k][0])
+        _search_cache.pop(oldest, None)
+    _search_cache[cache_key] = (time.monotonic(), results)
     return results
 
 
+async def prefetch_likely_searches(user_prompt: str, max_queries: int = 2) -> dict[str, list[dict]]:
+    """
+    Speculatively run the searches the coding model is most likely to request,
+    overlapping them with its think time. Keyed by the library token that
+    triggered the search; unused results are simply discarded.
+    """
+    tasks: dict[str, asyncio.Task] = {}
+    for m in _LIBRARY_HINT_RE.finditer(user_prompt):
+        name = m.group(1).lower()
+        if name in tasks:
+            continue
+        tasks[name] = asyncio.create_task(brave_search(f"{name} latest CDN url"))
+        if len(tasks) >= max_queries:
+            break
+
+    results: dict[str, list[dict]] = {}
+    for name, task in tasks.items():
+        try:
+            results[name] = await task
+        except Exception:
+            pass
+    return results
+
+
+def match_prefetched_search(prefetched: dict[str, list[dict]], query: str) -> list[dict] | None:
+    """Return prefetched results whose trigger token appears in the query."""
+    q = query.lower().replace(" ", "").replace(".", "")
+    for name, results in prefetched.items():
+        if name.replace(" ", "").replace(".", "") in q:
+            return results
+    return None
+
+
 def format_search_results(results: list[dict]) -> str:
     if not results:
         return "No results found."
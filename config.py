@@ -47,6 +47,7 @@ CODING_MODEL_FALLBACK = "groq/gpt-oss-120b"  # tried up to 2 times if primary fa
 
 # ── Anthropic vision model ────────────────────────────────────────────────────
 VISION_MODEL_ID = "anthropic/haiku"           # model_id key for billing table
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", "8"))
 
 # ── Internal role aliases ─────────────────────────────────────────────────────
 PLANNING_MODEL     = "groq/llama-3.3-70b"    # planning + intent classification
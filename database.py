@@ -1,6 +1,9 @@
 # database.py — fully async using supabase AsyncClient
 import asyncio
+import hashlib
 import logging
+import time
+from collections import deque
 from typing import Optional
 
 from supabase import acreate_client, AsyncClient
@@ -22,54 +25,138 @@ async def get_db() -> AsyncClient:
     return _client
 
 
-def get_supabase_client():
-    from supabase import create_client
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# ── Background writes ────────────────────────────────────────────────────────
+
+# Audit/log writes (version snapshots, edit history) don't gate anything the
+# user sees — run them as tracked background tasks so the agent turn finishes
+# without waiting on them. The set holds strong references (asyncio keeps
+# only weak ones); the callback also surfaces failures that would otherwise
+# be dropped silently at task GC.
+_deferred_writes: set = set()
+
+
+def _deferred_write_done(task) -> None:
+    _deferred_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("[DB] deferred write failed: %s", task.exception())
+
+
+def defer_write(coro) -> None:
+    """Schedule a non-critical DB write without blocking the caller."""
+    task = asyncio.create_task(coro)
+    _deferred_writes.add(task)
+    task.add_done_callback(_deferred_write_done)
 
 
 # ── Pages ────────────────────────────────────────────────────────────────────
 
+# Short-TTL page cache: /agent/run resolves the page for ownership and the
+# agent re-reads it milliseconds later — one fetch serves both. Every helper
+# that writes the pages table invalidates, so within this process the cache
+# can only serve rows we haven't touched in the last few seconds.
+_PAGE_CACHE_TTL_SECONDS = 5.0
+_PAGE_CACHE_MAX = 1024
+_page_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _page_cache_put(page_id: str, page: dict) -> None:
+    if len(_page_cache) >= _PAGE_CACHE_MAX:
+        oldest = min(_page_cache, key=lambda k: _page_cache[k][0])
+        _page_cache.pop(oldest, None)
+    _page_cache[page_id] = (time.monotonic(), page)
+
+
+def _page_cache_invalidate(page_id: str) -> None:
+    _page_cache.pop(page_id, None)
+
+
 async def get_page(page_id: str) -> dict:
+    hit = _page_cache.get(page_id)
+    if hit is not None and time.monotonic() - hit[0] < _PAGE_CACHE_TTL_SECONDS:
+        return hit[1]
     db = await get_db()
-    res = await db.table("pages").select("*").eq("id", page_id).single().execute()
-    return res.data
+    # limit(1) instead of single(): id is the primary key, so PostgREST's
+    # exactly-one-row enforcement (and its error path on zero rows) buys
+    # nothing — a plain list response is cheaper and returns None cleanly.
+    try:
+        # page_snapshot (migration 0003) folds latest_version and any
+        # unresolved clarification thread into the page row — one read per
+        # agent turn instead of three.
+        res = await db.table("page_snapshot").select("*").eq("id", page_id).limit(1).execute()
+    except Exception as e:
+        logger.warning("[DB] page_snapshot view unavailable (%s) — falling back to pages", e)
+        res = await db.table("pages").select("*").eq("id", page_id).limit(1).execute()
+    row = res.data[0] if res.data else None
+    if row:
+        _page_cache_put(page_id, row)
+    return row
 
 
 async def update_page_html(page_id: str, html: str):
+    _page_cache_invalidate(page_id)
     db = await get_db()
+    # returning="minimal" (here and on every write-only call below) stops
+    # PostgREST from serializing and shipping the mutated rows back — the
+    # response body is empty. Inserts whose callers read the new row id
+    # keep the default return=representation.
     await db.table("pages").update({
-        "html_content": html,
-        "updated_at": "now()"
-    }).eq("id", page_id).execute()
+        "html_content": html
+    }, returning="minimal").eq("id", page_id).execute()
+
+
+async def update_page_html_patch(page_id: str, patches: list,
+                                 expected_md5: Optional[str] = None) -> bool:
+    """
+    Apply str_replace patches server-side instead of shipping the full HTML.
+    patches: list of {"old_str": ..., "new_str": ...} applied in order.
+    expected_md5, when given, is the hash of the caller's locally computed
+    result — the function refuses to commit a document that differs from it.
+    Returns True on success; callers fall back to update_page_html on False.
+    """
+    _page_cache_invalidate(page_id)
+    try:
+        db = await get_db()
+        res = await db.rpc("apply_page_html_patches", {
+            "p_page_id": page_id,
+            "p_patches": patches,
+            "p_expected_md5": expected_md5,
+        }).execute()
+        data = res.data
+        if isinstance(data, dict):
+            return bool(data.get("success", False))
+        return bool(data)
+    except Exception as e:
+        logger.warning("[DB] update_page_html_patch failed page=%s: %s", page_id, e)
+        return False
 
 
 async def update_page_summary_and_map(page_id: str, html_summary: str, component_map: list):
+    _page_cache_invalidate(page_id)
     db = await get_db()
     await db.table("pages").update({
         "html_summary": html_summary,
-        "component_map": component_map,
-        "updated_at": "now()"
-    }).eq("id", page_id).execute()
+        "component_map": component_map
+    }, returning="minimal").eq("id", page_id).execute()
 
 
 async def update_page_coding_model(page_id: str, coding_model_id: Optional[str]):
+    _page_cache_invalidate(page_id)
     try:
         db = await get_db()
         await db.table("pages").update({
-            "coding_model_id": coding_model_id,
-            "updated_at": "now()"
-        }).eq("id", page_id).execute()
+            "coding_model_id": coding_model_id
+        }, returning="minimal").eq("id", page_id).execute()
     except Exception as e:
         logger.warning("[DB] update_page_coding_model failed: %s", e)
 
 
 async def update_page_inference_mode(page_id: str, mode: str):
+    _page_cache_invalidate(page_id)
     try:
         db = await get_db()
         await db.table("pages").update({
-            "inference_mode": mode,
-            "updated_at": "now()"
-        }).eq("id", page_id).execute()
+            "inference_mode": mode
+        }, returning="minimal").eq("id", page_id).execute()
     except Exception as e:
         logger.warning("[DB] update_page_inference_mode failed: %s", e)
 
@@ -80,31 +167,113 @@ async def set_agent_status(page_id: str, status: Optional[str]):
     Pass None to clear the status (agent done or idle).
     Silently swallows errors so it never crashes the agent loop.
     """
+    _page_cache_invalidate(page_id)
     try:
         db = await get_db()
         await db.table("pages").update({
             "agent_status": status,
             "agent_status_updated_at": "now()" if status else None,
-            "updated_at": "now()",
-        }).eq("id", page_id).execute()
+        }, returning="minimal").eq("id", page_id).execute()
     except Exception as e:
         logger.warning("[DB] set_agent_status failed page=%s status=%s: %s", page_id, status, e)
 
 
 # ── Chat ─────────────────────────────────────────────────────────────────────
 
+# Per-page ring buffer of recent chat messages. This process writes every
+# assistant message itself and learns the user prompt at the start of each
+# agent run, so we can usually serve history without shipping the bodies.
+# Gunicorn runs several workers, each with its own cache, so before a
+# cached buffer is trusted it is validated against a cheap freshness
+# marker: the exact row count of the page's chat/clarification messages.
+# Every local mirror corresponds to exactly one DB row, so the counts only
+# disagree when another worker (or the frontend) wrote — then we re-seed.
+# The TTL still bounds how long a dead entry occupies memory.
+_chat_history_cache: dict[str, "deque"] = {}
+_chat_history_cache_ts: dict[str, float] = {}
+_chat_history_expected_count: dict[str, int] = {}
+_CHAT_HISTORY_TTL_SECONDS = 300
+_CHAT_HISTORY_MAXLEN      = 20
+_CHAT_HISTORY_MAX_PAGES   = 512
+
+
+def _cache_chat_message(page_id: str, row: dict):
+    dq = _chat_history_cache.get(page_id)
+    if dq is not None:
+        dq.append(row)
+    if page_id in _chat_history_expected_count:
+        _chat_history_expected_count[page_id] += 1
+
+
+async def _chat_history_is_fresh(page_id: str) -> bool:
+    """HEAD-count the page's messages and compare with what we mirrored."""
+    expected = _chat_history_expected_count.get(page_id)
+    if expected is None:
+        return False
+    try:
+        db = await get_db()
+        res = (
+            await db.table("chat_messages")
+            .select("id", count="exact", head=True)
+            .eq("page_id", page_id)
+            .in_("message_type", ["chat", "clarification"])
+            .execute()
+        )
+        return res.count == expected
+    except Exception as e:
+        logger.warning("[DB] chat history freshness check failed page=%s: %s", page_id, e)
+        return False
+
+
+def record_user_message(page_id: str, content: str):
+    """
+    Mirror the user's incoming prompt into the history cache. The frontend
+    inserts the row itself before calling this backend, so no DB write here.
+    """
+    _cache_chat_message(page_id, {
+        "role": "user",
+        "content": content,
+        "message_type": "chat",
+        "meta": {},
+        "status": "processing",
+    })
+
+
 async def get_chat_history(page_id: str, limit: int = 10) -> list:
+    dq = _chat_history_cache.get(page_id)
+    if (
+        dq is not None
+        and time.monotonic() - _chat_history_cache_ts.get(page_id, 0.0) < _CHAT_HISTORY_TTL_SECONDS
+        and await _chat_history_is_fresh(page_id)
+    ):
+        return list(dq)[-limit:]
+
     db = await get_db()
     res = (
         await db.table("chat_messages")
-        .select("role, content, message_type, meta, status")
+        .select("role, content, message_type, meta, status", count="exact")
         .eq("page_id", page_id)
         .in_("message_type", ["chat", "clarification"])
         .order("created_at", desc=True)
         .limit(limit)
         .execute()
     )
-    return list(reversed(res.data))
+    # Newest-first from the index scan; one slice-reverse back to
+    # chronological order instead of wrapping an iterator.
+    rows = (res.data or [])[::-1]
+
+    if len(_chat_history_cache) >= _CHAT_HISTORY_MAX_PAGES:
+        oldest = min(_chat_history_cache_ts, key=_chat_history_cache_ts.get)
+        _chat_history_cache.pop(oldest, None)
+        _chat_history_cache_ts.pop(oldest, None)
+        _chat_history_expected_count.pop(oldest, None)
+    _chat_history_cache[page_id] = deque(rows, maxlen=_CHAT_HISTORY_MAXLEN)
+    _chat_history_cache_ts[page_id] = time.monotonic()
+    if res.count is not None:
+        _chat_history_expected_count[page_id] = res.count
+    else:
+        _chat_history_expected_count.pop(page_id, None)
+    return rows
 
 
 async def get_consecutive_clarification_count(page_id: str) -> int:
@@ -130,7 +299,7 @@ async def update_message_status(message_id: str, status: str):
     db = await get_db()
     await db.table("chat_messages").update({
         "status": status
-    }).eq("id", message_id).execute()
+    }, returning="minimal").eq("id", message_id).execute()
 
 
 async def insert_assistant_message(
@@ -147,7 +316,15 @@ async def insert_assistant_message(
         "status": "completed",
         "message_type": message_type,
         "meta": meta or {}
-    }).execute()
+    }, returning="minimal").execute()
+    if message_type in ("chat", "clarification"):
+        _cache_chat_message(page_id, {
+            "role": "assistant",
+            "content": content,
+            "message_type": message_type,
+            "meta": meta or {},
+            "status": "completed",
+        })
 
 
 async def insert_thinking_message(page_id: str, plan: dict) -> Optional[str]:
@@ -163,23 +340,48 @@ async def insert_thinking_message(page_id: str, plan: dict) -> Optional[str]:
     return res.data[0]["id"] if res.data else None
 
 
+# Rolling per-page hash of the last snapshot taken by this process.
+# Lets us skip writing a full duplicate snapshot when an agent run ends
+# with the same HTML it already snapshotted (common in rapid edit loops).
+_last_snapshot_hash: dict[str, bytes] = {}
+_LAST_SNAPSHOT_HASH_MAX = 1024
+
+
 async def snapshot_version(page_id: str, html: str, trigger_type: str = "agent_complete"):
+    h = hashlib.blake2b(html.encode(), digest_size=16).digest()
+    if _last_snapshot_hash.get(page_id) == h:
+        logger.info("[DB] snapshot_version skipped (unchanged) page=%s", page_id)
+        return
     db = await get_db()
-    res = (
-        await db.table("page_versions")
-        .select("version_num")
-        .eq("page_id", page_id)
-        .order("version_num", desc=True)
-        .limit(1)
-        .execute()
-    )
-    next_version = (res.data[0]["version_num"] + 1) if res.data else 1
-    await db.table("page_versions").insert({
-        "page_id": page_id,
-        "html_snapshot": html,
-        "version_num": next_version,
-        "trigger_type": trigger_type
-    }).execute()
+    try:
+        # One RPC does MAX(version_num)+1 and the INSERT in a single
+        # statement server-side — half the round-trips of the fallback and
+        # no SELECT-then-INSERT race between concurrent snapshots.
+        await db.rpc("snapshot_page_version", {
+            "p_page_id": page_id,
+            "p_html": html,
+            "p_trigger_type": trigger_type,
+        }).execute()
+    except Exception as e:
+        logger.warning("[DB] snapshot_page_version RPC failed page=%s (%s) — falling back", page_id, e)
+        res = (
+            await db.table("page_versions")
+            .select("version_num")
+            .eq("page_id", page_id)
+            .order("version_num", desc=True)
+            .limit(1)
+            .execute()
+        )
+        next_version = (res.data[0]["version_num"] + 1) if res.data else 1
+        await db.table("page_versions").insert({
+            "page_id": page_id,
+            "html_snapshot": html,
+            "version_num": next_version,
+            "trigger_type": trigger_type
+        }, returning="minimal").execute()
+    if len(_last_snapshot_hash) >= _LAST_SNAPSHOT_HASH_MAX:
+        _last_snapshot_hash.pop(next(iter(_last_snapshot_hash)))
+    _last_snapshot_hash[page_id] = h
 
 
 async def get_page_versions(page_id: str, limit: int = 10) -> list:
@@ -201,10 +403,10 @@ async def get_version_html(version_id: str) -> Optional[str]:
         await db.table("page_versions")
         .select("html_snapshot")
         .eq("id", version_id)
-        .single()
+        .limit(1)
         .execute()
     )
-    return res.data["html_snapshot"] if res.data else None
+    return res.data[0]["html_snapshot"] if res.data else None
 
 
 async def get_edit_history(page_id: str, limit: int = 5) -> list:
@@ -248,7 +450,7 @@ async def insert_edit_history(
         "tokens_used": tokens_used,
         "success": success,
         "owner_id": owner_id
-    }).execute()
+    }, returning="minimal").execute()
 
 
 async def insert_clarification(page_id: str, message_id: str, question: str) -> Optional[str]:
@@ -262,13 +464,17 @@ async def insert_clarification(page_id: str, message_id: str, question: str) ->
     return res.data[0]["id"] if res.data else None
 
 
-async def resolve_clarification(clarification_id: str, answer: str):
+async def resolve_clarification(clarification_id: str, answer: str, page_id: str = None):
+    # The cached page_snapshot row embeds the unresolved thread; drop it so
+    # a follow-up turn within the TTL doesn't re-resolve the same question.
+    if page_id:
+        _page_cache_invalidate(page_id)
     db = await get_db()
     await db.table("clarification_threads").update({
         "answer": answer,
         "resolved": True,
         "resolved_at": "now()"
-    }).eq("id", clarification_id).execute()
+    }, returning="minimal").eq("id", clarification_id).execute()
 
 
 async def get_pending_clarification(page_id: str) -> Optional[dict]:
@@ -291,7 +497,9 @@ async def get_pending_assets_for_page(page_id: str) -> list:
     db = await get_db()
     res = (
         await db.table("page_assets")
-        .select("*")
+        # Only what the pipeline reads — skips shipping the wide vision/
+        # extraction text columns (empty here anyway) on every poll.
+        .select("id, page_id, asset_type, file_type, storage_path, original_file_name")
         .eq("page_id", page_id)
         .eq("processing_status", "pending")
         .is_("parent_asset_id", "null")
@@ -300,11 +508,37 @@ async def get_pending_assets_for_page(page_id: str) -> list:
     return res.data or []
 
 
+async def count_page_assets_ready(page_id: str) -> Optional[int]:
+    """
+    HEAD-count the page's ready assets — the asset-context cache's freshness
+    marker. Ships no row bodies; None (on error) means "can't tell".
+    """
+    try:
+        db = await get_db()
+        res = (
+            await db.table("page_assets")
+            .select("id", count="exact", head=True)
+            .eq("page_id", page_id)
+            .eq("processing_status", "ready")
+            .execute()
+        )
+        return res.count
+    except Exception as e:
+        logger.warning("[DB] ready-asset count failed page=%s: %s", page_id, e)
+        return None
+
+
 async def get_page_assets_ready(page_id: str) -> list:
     db = await get_db()
     res = (
         await db.table("page_assets")
-        .select("*")
+        # Exactly the fields the asset-context builder formats.
+        .select(
+            "asset_type, original_file_name, public_url, width, height, "
+            "vision_description, vision_suggested_use, vision_alt_text, "
+            "vision_tags, dominant_colors, vision_contains_text, "
+            "vision_extracted_text, extracted_summary, extracted_text"
+        )
         .eq("page_id", page_id)
         .eq("processing_status", "ready")
         .order("created_at", desc=False)
@@ -313,12 +547,14 @@ async def get_page_assets_ready(page_id: str) -> list:
     return res.data or []
 
 
-async def update_asset_processing_started(asset_id: str):
+async def update_assets_processing_started(asset_ids: list):
+    """Flip a whole batch of assets to "processing" in one statement."""
+    if not asset_ids:
+        return
     db = await get_db()
     await db.table("page_assets").update({
-        "processing_status": "processing",
-        "updated_at": "now()"
-    }).eq("id", asset_id).execute()
+        "processing_status": "processing"
+    }, returning="minimal").in_("id", asset_ids).execute()
 
 
 async def update_asset_image_result(
@@ -340,9 +576,39 @@ async def update_asset_image_result(
         "vision_alt_text": vision_alt_text,
         "vision_contains_text": vision_contains_text,
         "vision_extracted_text": vision_extracted_text,
-        "dominant_colors": dominant_colors,
-        "updated_at": "now()"
-    }).eq("id", asset_id).execute()
+        "dominant_colors": dominant_colors
+    }, returning="minimal").eq("id", asset_id).execute()
+
+
+async def bulk_update_asset_image_results(rows: list) -> None:
+    """
+    Flip a batch of image assets to "ready" with their vision fields in one
+    UPDATE ... FROM statement server-side (migration 0004). rows: dicts with
+    asset_id plus the vision fields. Falls back to per-row updates while the
+    RPC is not deployed.
+    """
+    if not rows:
+        return
+    db = await get_db()
+    try:
+        await db.rpc("bulk_update_asset_image_results", {"p_rows": rows}).execute()
+    except Exception as e:
+        logger.warning(
+            "[DB] bulk_update_asset_image_results RPC failed (%s) — falling back to per-row updates", e
+        )
+        await asyncio.gather(*[
+            update_asset_image_result(
+                asset_id=row["asset_id"],
+                vision_description=row["vision_description"],
+                vision_tags=row["vision_tags"],
+                vision_suggested_use=row["vision_suggested_use"],
+                vision_alt_text=row["vision_alt_text"],
+                vision_contains_text=row["vision_contains_text"],
+                vision_extracted_text=row["vision_extracted_text"],
+                dominant_colors=row["dominant_colors"],
+            )
+            for row in rows
+        ])
 
 
 async def update_asset_document_result(
@@ -354,50 +620,28 @@ async def update_asset_document_result(
     await db.table("page_assets").update({
         "processing_status": "ready",
         "extracted_text": extracted_text,
-        "extracted_summary": extracted_summary,
-        "updated_at": "now()"
-    }).eq("id", asset_id).execute()
+        "extracted_summary": extracted_summary
+    }, returning="minimal").eq("id", asset_id).execute()
 
 
 async def mark_asset_failed(asset_id: str, error: str):
     db = await get_db()
     await db.table("page_assets").update({
         "processing_status": "failed",
-        "processing_error": error,
-        "updated_at": "now()"
-    }).eq("id", asset_id).execute()
+        "processing_error": error
+    }, returning="minimal").eq("id", asset_id).execute()
 
 
-async def insert_extracted_image_asset(
-    page_id: str,
-    owner_id: str,
-    parent_asset_id: str,
-    file_name: str,
-    original_file_name: str,
-    file_type: str,
-    storage_path: str,
-    public_url: str,
-    width: int,
-    height: int,
-    file_size_bytes: int,
-) -> Optional[str]:
+async def insert_extracted_image_assets(rows: list) -> None:
+    """
+    Insert fully-formed extracted-image rows (vision fields included) in one
+    request. Rows arrive already "ready", so the pipeline never re-downloads
+    bytes it just uploaded.
+    """
+    if not rows:
+        return
     db = await get_db()
-    res = await db.table("page_assets").insert({
-        "page_id": page_id,
-        "owner_id": owner_id,
-        "parent_asset_id": parent_asset_id,
-        "file_name": file_name,
-        "original_file_name": original_file_name,
-        "file_type": file_type,
-        "asset_type": "extracted_image",
-        "storage_path": storage_path,
-        "public_url": public_url,
-        "width": width,
-        "height": height,
-        "file_size_bytes": file_size_bytes,
-        "processing_status": "processing",
-    }).execute()
-    return res.data[0]["id"] if res.data else None
+    await db.table("page_assets").insert(rows, returning="minimal").execute()
 
 
 # ── Billing ───────────────────────────────────────────────────────────────────
@@ -1,6 +1,9 @@
 # main.py
 import asyncio
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 
 from fastapi import FastAPI, HTTPException
@@ -14,13 +17,31 @@ from boilerplate import INITIAL_BOILERPLATE
 
 # ---------------------------------------------------------------------------
 # Logging — structured, visible in Railway
+#
+# Log records are dropped into an in-memory queue and written to stdout by a
+# background thread. With stdout piped to a log collector, a direct
+# StreamHandler can block the event loop for tens of ms under load; the
+# queue makes every log call from async code effectively non-blocking.
 # ---------------------------------------------------------------------------
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(
+    logging.Formatter(
+        fmt="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
+        datefmt="%Y-%m-%dT%H:%M:%S",
+    )
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, _stdout_handler)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# QueueHandler pre-formats records with its own formatter before enqueueing;
+# keep that a no-op so the listener's handler applies the real format.
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s — %(message)s",
-    datefmt="%Y-%m-%dT%H:%M:%S",
-    handlers=[logging.StreamHandler(sys.stdout)],
+    handlers=[_queue_handler],
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 # Quiet noisy libraries
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
@@ -30,6 +51,11 @@ logging.getLogger("realtime").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Agent runs are dispatched fire-and-forget; asyncio only keeps weak
+# references to tasks, so hold a strong one until each run finishes or a
+# mid-run task can be garbage-collected.
+_agent_tasks: set = set()
+
 app = FastAPI(title="Hyphertext Agent Backend")
 
 app.add_middleware(
@@ -46,6 +72,9 @@ class AgentRunRequest(BaseModel):
     content: str
     model_id: Optional[str] = None
     inference_mode: Optional[str] = None
+    # Supplied by the calling edge function, which has already authenticated
+    # the user and owns the page row — lets us accept without a DB lookup.
+    owner_id: Optional[str] = None
 
 
 @app.on_event("startup")
@@ -65,12 +94,17 @@ async def agent_run(req: AgentRunRequest):
         req.page_id, req.message_id, len(req.content),
     )
     try:
-        page = await get_page(req.page_id)
-        if not page:
-            logger.warning("[API] Page not found: %s", req.page_id)
-            raise HTTPException(status_code=404, detail="Page not found")
-
-        owner_id = page.get("owner_id")
+        # When the edge function vouches for owner_id we skip the page
+        # lookup entirely — the orchestrator fetches the row moments later
+        # anyway and aborts the run itself if the page doesn't exist.
+        # Requests without owner_id (older callers) keep the existence check.
+        owner_id = req.owner_id
+        if owner_id is None:
+            page = await get_page(req.page_id)
+            if not page:
+                logger.warning("[API] Page not found: %s", req.page_id)
+                raise HTTPException(status_code=404, detail="Page not found")
+            owner_id = page.get("owner_id")
 
         inference_mode = req.inference_mode
         if inference_mode not in ("economy", "speed"):
@@ -81,7 +115,7 @@ async def agent_run(req: AgentRunRequest):
             req.page_id, owner_id,
         )
 
-        asyncio.create_task(
+        task = asyncio.create_task(
             run_orchestrator(
                 page_id=req.page_id,
                 message_id=req.message_id,
@@ -90,6 +124,8 @@ async def agent_run(req: AgentRunRequest):
                 requested_inference_mode=inference_mode,
             )
         )
+        _agent_tasks.add(task)
+        task.add_done_callback(_agent_tasks.discard)
 
         return {"status": "accepted"}
 
@@ -0,0 +1,36 @@
+-- Composite indexes backing the hot WHERE + ORDER BY paths in database.py.
+--
+-- Each of these queries runs on every agent turn with a small LIMIT; without
+-- a matching index Postgres heap-scans the table and sorts, so a 1ms lookup
+-- degrades to tens of ms as the tables grow. With the index each query is a
+-- single index scan that stops after LIMIT rows.
+--
+-- Apply via the Supabase SQL editor or psql. CREATE INDEX CONCURRENTLY
+-- cannot run inside a transaction block — run each statement on its own.
+
+-- get_chat_history: .eq(page_id).in_(message_type).order(created_at DESC).limit(10)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_messages_page_type_created_idx
+    ON chat_messages (page_id, message_type, created_at DESC);
+
+-- get_pending_assets_for_page: .eq(page_id).eq(processing_status).is_(parent_asset_id, null)
+-- get_page_assets_ready:       .eq(page_id).eq(processing_status).order(created_at)
+-- count_page_assets_ready:     .eq(page_id).eq(processing_status), count only
+-- One unfiltered index serves all three: ready rows include extracted_image
+-- children, so a partial WHERE parent_asset_id IS NULL index could not carry
+-- the ready fetch, and that query runs on every asset-context cache miss —
+-- exactly the post-upload turns. The trailing created_at makes the ready
+-- fetch's ORDER BY an index-order read; the pending poll just ignores it.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS page_assets_page_status_created_idx
+    ON page_assets (page_id, processing_status, created_at);
+
+-- snapshot_version fallback + get_page_versions: .eq(page_id).order(version_num DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS page_versions_page_ver_idx
+    ON page_versions (page_id, version_num DESC);
+
+-- get_edit_history: .eq(page_id).order(created_at DESC).limit(5)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS edit_history_page_created_idx
+    ON edit_history (page_id, created_at DESC);
+
+-- get_consecutive_clarification_count: .eq(page_id).order(created_at DESC).limit(5)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS clarification_threads_page_created_idx
+    ON clarification_threads (page_id, created_at DESC);
@@ -0,0 +1,29 @@
+-- Maintain updated_at server-side with a BEFORE UPDATE trigger instead of
+-- shipping "updated_at": "now()" as a JSON literal on every write.
+--
+-- Fewer bytes per request, one less column for PostgREST to parse, and a
+-- single source of truth — updates issued outside this backend (dashboard,
+-- frontend) get the timestamp too. The Python helpers no longer send the
+-- field; apply this migration before deploying that change.
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pages_touch ON pages;
+CREATE TRIGGER pages_touch
+    BEFORE UPDATE ON pages
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS chat_messages_touch ON chat_messages;
+CREATE TRIGGER chat_messages_touch
+    BEFORE UPDATE ON chat_messages
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS page_assets_touch ON page_assets;
+CREATE TRIGGER page_assets_touch
+    BEFORE UPDATE ON page_assets
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
@@ -0,0 +1,22 @@
+-- page_snapshot: the pages row plus the latest version number and any
+-- unresolved clarification thread, folded into one read.
+--
+-- The agent turn previously fetched these through three PostgREST calls
+-- (get_page, get_pending_clarification, latest version); the scalar
+-- subqueries ride the indexes from 0001 so the merged read costs the same
+-- as the plain pages lookup. database.get_page selects from this view and
+-- falls back to the pages table while the migration is not yet applied.
+
+CREATE OR REPLACE VIEW page_snapshot AS
+SELECT
+    p.*,
+    (SELECT MAX(v.version_num)
+       FROM page_versions v
+      WHERE v.page_id = p.id)           AS latest_version,
+    (SELECT to_jsonb(c)
+       FROM clarification_threads c
+      WHERE c.page_id = p.id
+        AND NOT c.resolved
+      ORDER BY c.created_at DESC
+      LIMIT 1)                          AS pending_clarification
+FROM pages p;
@@ -0,0 +1,28 @@
+-- Bulk vision-result writeback: one UPDATE ... FROM covering every image
+-- asset of a pipeline run instead of an HTTPS round-trip and transaction
+-- per asset. database.bulk_update_asset_image_results calls this and falls
+-- back to per-row updates while the function is not yet deployed.
+
+CREATE OR REPLACE FUNCTION bulk_update_asset_image_results(p_rows jsonb)
+RETURNS void AS $$
+    UPDATE page_assets AS a SET
+        processing_status     = 'ready',
+        vision_description    = r.vision_description,
+        vision_tags           = r.vision_tags,
+        vision_suggested_use  = r.vision_suggested_use,
+        vision_alt_text       = r.vision_alt_text,
+        vision_contains_text  = r.vision_contains_text,
+        vision_extracted_text = r.vision_extracted_text,
+        dominant_colors       = r.dominant_colors
+    FROM jsonb_to_recordset(p_rows) AS r(
+        asset_id              uuid,
+        vision_description    text,
+        vision_tags           jsonb,
+        vision_suggested_use  text,
+        vision_alt_text       text,
+        vision_contains_text  boolean,
+        vision_extracted_text text,
+        dominant_colors       jsonb
+    )
+    WHERE a.id = r.asset_id;
+$$ LANGUAGE sql;
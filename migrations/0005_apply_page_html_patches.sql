@@ -0,0 +1,97 @@
+-- Server-side str_replace splice: the agent ships only the (old_str,
+-- new_str) pairs of a turn instead of the whole document, and this
+-- function re-applies them against the stored HTML in one round-trip.
+-- database.update_page_html_patch calls this; any failure returns
+-- success=false and the caller falls back to a full-document write.
+--
+-- Semantics mirror execute_multi_replace in agents/tools/html_tools.py:
+-- every old_str is located in the ORIGINAL document (first occurrence),
+-- matches are sorted by position and applied as one splice. Where the
+-- Python helper skips a failed or overlapping match, this function bails
+-- out instead — a partial apply here would silently diverge from the
+-- document the agent computed locally. The caller may also pass the md5
+-- of its locally computed result; a mismatch likewise falls back.
+
+CREATE OR REPLACE FUNCTION apply_page_html_patches(
+    p_page_id      uuid,
+    p_patches      jsonb,
+    p_expected_md5 text DEFAULT NULL
+) RETURNS jsonb AS $$
+DECLARE
+    patch    jsonb;
+    v_html   text;
+    v_old    text;
+    v_new    text;
+    v_pos    int;
+    v_starts int[]  := '{}';
+    v_ends   int[]  := '{}';
+    v_news   text[] := '{}';
+    v_n      int;
+    v_i      int;
+    v_j      int;
+    v_ts     int;
+    v_te     int;
+    v_tn     text;
+    v_result text := '';
+    v_cursor int  := 1;
+BEGIN
+    SELECT html_content INTO v_html FROM pages WHERE id = p_page_id FOR UPDATE;
+    IF v_html IS NULL THEN
+        RETURN jsonb_build_object('success', false, 'reason', 'page not found');
+    END IF;
+
+    -- Locate every old_str in the original document.
+    FOR patch IN SELECT * FROM jsonb_array_elements(p_patches) LOOP
+        v_old := patch->>'old_str';
+        v_new := coalesce(patch->>'new_str', '');
+        IF v_old IS NULL OR v_old = '' THEN
+            RETURN jsonb_build_object('success', false, 'reason', 'empty old_str');
+        END IF;
+        v_pos := strpos(v_html, v_old);
+        IF v_pos = 0 THEN
+            RETURN jsonb_build_object('success', false, 'reason', 'old_str not found');
+        END IF;
+        v_starts := v_starts || v_pos;
+        v_ends   := v_ends   || (v_pos + length(v_old));
+        v_news   := v_news   || v_new;
+    END LOOP;
+
+    v_n := coalesce(array_length(v_starts, 1), 0);
+    IF v_n = 0 THEN
+        RETURN jsonb_build_object('success', false, 'reason', 'no patches');
+    END IF;
+
+    -- Sort matches by start offset (insertion sort — patch lists are tiny).
+    FOR v_i IN 2..v_n LOOP
+        v_ts := v_starts[v_i];  v_te := v_ends[v_i];  v_tn := v_news[v_i];
+        v_j  := v_i - 1;
+        WHILE v_j >= 1 AND v_starts[v_j] > v_ts LOOP
+            v_starts[v_j + 1] := v_starts[v_j];
+            v_ends[v_j + 1]   := v_ends[v_j];
+            v_news[v_j + 1]   := v_news[v_j];
+            v_j := v_j - 1;
+        END LOOP;
+        v_starts[v_j + 1] := v_ts;  v_ends[v_j + 1] := v_te;  v_news[v_j + 1] := v_tn;
+    END LOOP;
+
+    -- Single splice; overlapping matches mean the edits don't commute.
+    FOR v_i IN 1..v_n LOOP
+        IF v_starts[v_i] < v_cursor THEN
+            RETURN jsonb_build_object('success', false, 'reason', 'overlapping patches');
+        END IF;
+        v_result := v_result
+            || substr(v_html, v_cursor, v_starts[v_i] - v_cursor)
+            || v_news[v_i];
+        v_cursor := v_ends[v_i];
+    END LOOP;
+    v_result := v_result || substr(v_html, v_cursor);
+
+    IF p_expected_md5 IS NOT NULL AND md5(v_result) <> p_expected_md5 THEN
+        RETURN jsonb_build_object('success', false, 'reason', 'result mismatch');
+    END IF;
+
+    -- updated_at is touched by the trigger from 0002.
+    UPDATE pages SET html_content = v_result WHERE id = p_page_id;
+    RETURN jsonb_build_object('success', true);
+END
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,22 @@
+-- Version snapshots in one round-trip: database.snapshot_version calls
+-- this instead of SELECT MAX(version_num) followed by an INSERT — half
+-- the HTTPS traffic per snapshot and no read-then-write race between
+-- concurrent agent runs on the same page. The Python fallback (the old
+-- two-call sequence) stays in place until this migration is applied.
+
+CREATE OR REPLACE FUNCTION snapshot_page_version(
+    p_page_id      uuid,
+    p_html         text,
+    p_trigger_type text
+) RETURNS void AS $$
+    INSERT INTO page_versions (page_id, html_snapshot, version_num, trigger_type)
+    VALUES (
+        p_page_id,
+        p_html,
+        COALESCE(
+            (SELECT MAX(version_num) FROM page_versions WHERE page_id = p_page_id),
+            0
+        ) + 1,
+        p_trigger_type
+    );
+$$ LANGUAGE sql;